@@ -18,7 +18,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import calendar, datetime, os, sys
-import buxpaper
+import buxpaper, buxui
 
 from PyQt4.QtCore import QProcess, QString, QTimer, Qt, pyqtSignal
 from PyQt4.QtGui import *
@@ -60,7 +60,7 @@ class CalendarLabel(QWidget):
         painter.end()
 
 
-class Calendar(buxpaper.Window):
+class Calendar(buxui.Window):
 
     LabelFormat = "%d"
     CurrentLabelColour = "#c0c0c0"
@@ -71,22 +71,23 @@ class Calendar(buxpaper.Window):
     
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         self.editing = False
         
         self.sleepButton.clicked.connect(self.setSleepImage)
         self.sleepButton.show()
         
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.previousButton.clicked.connect(self.previousMonth)
         self.panel.addWidget(self.previousButton)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.nextButton.clicked.connect(self.nextMonth)
         self.panel.addWidget(self.nextButton)
         
-        self.config = buxpaper.Config(os.path.join(CalendarDir, "calendar.json"))
+        self.config = buxpaper.Config(os.path.join(CalendarDir, "calendar.json"),
+                                      delay = 5)
         self.config.load()
         
         self.label_format = self.config.get(
@@ -243,11 +244,11 @@ class Calendar(buxpaper.Window):
         layout.addStretch()
         
         buttons = QHBoxLayout()
-        editButton = buxpaper.Label(self.tr("Edit"))
+        editButton = buxui.Label(self.tr("Edit"))
         editButton.clicked.connect(self.editDayText)
         buttons.addWidget(editButton)
         
-        backButton = buxpaper.Label(self.tr("Back"))
+        backButton = buxui.Label(self.tr("Back"))
         backButton.clicked.connect(self.showMonthPage)
         buttons.addWidget(backButton)
         
@@ -288,6 +289,9 @@ class Calendar(buxpaper.Window):
         else:
             del self.appointments[day_date.isoformat()]
         
+        # Store a copy because the config writes it in the background.
+        self.config.set("Appointments", self.appointments.copy())
+        
         QTimer.singleShot(0, self.finishEditing)
     
     def finishEditing(self):
@@ -316,8 +320,8 @@ class Calendar(buxpaper.Window):
         self.config.set("Label format", self.label_format)
         self.config.set("Current label colour", self.current_label_colour)
         self.config.set("Appointment label colour", self.appointment_label_colour)
-        self.config.set("Appointments", self.appointments)
-        self.config.save()
+        self.config.set("Appointments", self.appointments.copy())
+        self.config.flush()
     
     def display_and_quit(self):
     
@@ -330,7 +334,7 @@ if __name__ == "__main__":
     if not buxpaper.unlock(SecretCalendarDir, CalendarDir):
         sys.exit(1)
     
-    app = buxpaper.Application()
+    app = buxui.Application()
     c = Calendar()
     c.showFullScreen()
     sys.exit(app.exec_())
@@ -18,16 +18,16 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import math, sys
-import buxpaper
+import buxui
 
 from PyQt4.QtCore import QDateTime, QRect, QTimer, Qt
 from PyQt4.QtGui import QApplication, QBrush, QFont, QFontMetrics, QPainter, QPen
 
-class Clock(buxpaper.Window):
+class Clock(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         start_time = QDateTime.currentDateTime().time()
         self.displayTime = (start_time.hour(), start_time.minute())
@@ -37,6 +37,11 @@ class Clock(buxpaper.Window):
         self.timer.setInterval(5000)
         self.timer.start()
         
+        # Stop updating the time while nobody can see it.
+        power = buxui.power_manager()
+        if power:
+            power.blanked.connect(self.setBlanked)
+        
         self.foreground = QPen(self.palette().foreground().color())
         self.background = self.palette().background()
         
@@ -62,6 +67,14 @@ class Clock(buxpaper.Window):
             
             QTimer.singleShot(500, self.updateText)
     
+    def setBlanked(self, blanked):
+    
+        if blanked:
+            self.timer.stop()
+        else:
+            self.updateTime()
+            self.timer.start()
+    
     def updateText(self):
     
         rect = QRect(0, self.height() * 0.75, self.width(), self.maxHeight)
@@ -134,7 +147,7 @@ class Clock(buxpaper.Window):
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     c = Clock()
     c.showFullScreen()
     sys.exit(app.exec_())
@@ -20,7 +20,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import math, os, sys
-import buxpaper
+import buxpaper, buxui, dither
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
@@ -53,22 +53,22 @@ contrast_icon = (
 SecretGalleryDir = os.path.join(buxpaper.picdir, ".Gallery")
 GalleryDir = os.path.join(buxpaper.picdir, "Gallery")
 
-class Gallery(buxpaper.Window):
+class Gallery(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         self.index = 0
         
         self.sleepButton.clicked.connect(self.setSleepImage)
         self.sleepButton.show()
         
-        browserIcon = buxpaper.icon_from_commands(buxpaper.browser_icon,
+        browserIcon = buxui.icon_from_commands(buxui.browser_icon,
             self.closeButton.sizeHint().width(), self.closeButton.sizeHint().height())
         
         # Add a button for accessing the image browser.
-        self.browserButton = buxpaper.Button(browserIcon)
+        self.browserButton = buxui.Button(browserIcon)
         self.browserButton.clicked.connect(self.showBrowser)
         self.panel.addWidget(self.browserButton)
         
@@ -80,29 +80,29 @@ class Gallery(buxpaper.Window):
         self.adjustImageWindow.decreaseContrast.connect(self.decreaseContrast)
         self.adjustImageWindow.saveSettings.connect(self.saveSettings)
         
-        self.adjustImageButton = buxpaper.Button(u"A")
+        self.adjustImageButton = buxui.Button(u"A")
         self.adjustImageButton.clicked.connect(self.adjustImage)
         self.panel.addWidget(self.adjustImageButton)
         
-        self.saveThumbnailButton = buxpaper.Button(u"T")
+        self.saveThumbnailButton = buxui.Button(u"T")
         self.saveThumbnailButton.clicked.connect(self.saveThumbnail)
         self.saveThumbnailButton.hide()
         self.panel.addWidget(self.saveThumbnailButton)
         
         # Add a zoom button to the panel.
-        self.zoomOutButton = buxpaper.Button("-")
+        self.zoomOutButton = buxui.Button("-")
         self.zoomOutButton.clicked.connect(self.zoomOut)
         self.panel.addWidget(self.zoomOutButton)
 
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.previousButton.clicked.connect(self.previousPage)
         self.panel.addWidget(self.previousButton)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.nextButton.clicked.connect(self.nextPage)
         self.panel.addWidget(self.nextButton)
         
-        self.config = buxpaper.Config(buxpaper.settings + "-gallery")
+        self.config = buxpaper.JournalConfig(buxpaper.settings + "-gallery")
         self.config.load()
         
         # Use a stacked layout inside the main content widget.
@@ -149,7 +149,7 @@ class Gallery(buxpaper.Window):
                 image = QImage(path).scaled(width, height, Qt.KeepAspectRatio)
                 image.save(thumbnail_path)
             
-            label = buxpaper.Label(name, index)
+            label = buxui.Label(name, index)
             label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
             label.setPixmap(QPixmap.fromImage(image))
             label.clicked.connect(self.showPreview)
@@ -172,7 +172,7 @@ class Gallery(buxpaper.Window):
     
     def createPreviewPage(self):
     
-        self.previewPage = buxpaper.Picture()
+        self.previewPage = buxui.Picture()
         self.previewPage.clicked.connect(self.zoom)
     
     def showBrowser(self):
@@ -337,7 +337,7 @@ class Gallery(buxpaper.Window):
         
         if self.adjustments["contrast"] == 0 and \
             self.adjustments["brightness"] == 0:
-            return image
+            return self.ditherImage(image)
         
         image.save("/tmp/image.png")
         im = Image.open("/tmp/image.png")
@@ -353,7 +353,18 @@ class Gallery(buxpaper.Window):
         im.save("/tmp/image.png")
         
         image = QImage("/tmp/image.png")
-        return image
+        return self.ditherImage(image)
+    
+    def ditherImage(self, image):
+    
+        # Reduce the image to the grey levels used by the display so that it
+        # can be shown quickly and without banding.
+        levels = self.config.get("Grey levels", 16)
+        if not levels:
+            return image
+        
+        method = self.config.get("Dither method", dither.ORDERED)
+        return buxui.dither_image(image, levels, method)
     
     def adjustImage(self):
     
@@ -406,8 +417,9 @@ class Gallery(buxpaper.Window):
     def saveSettings(self):
     
         # Update the configuration with the current image's adjustment settings.
-        self.config.set(self.path, self.adjustments)
-        self.config.save()
+        # Store a copy of the adjustments so that further editing does not
+        # change the saved settings.
+        self.config.set(self.path, self.adjustments.copy())
         self.adjustImageWindow.updateButtons(self.adjustments, initial = True)
     
     def setSleepImage(self):
@@ -441,35 +453,35 @@ class AdjustImageWindow(QWidget):
         layout = QGridLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         
-        self.decreaseBrightnessButton = buxpaper.Button("-")
-        self.increaseBrightnessButton = buxpaper.Button("+")
+        self.decreaseBrightnessButton = buxui.Button("-")
+        self.increaseBrightnessButton = buxui.Button("+")
         self.decreaseBrightnessButton.clicked.connect(self.decreaseBrightness)
         self.increaseBrightnessButton.clicked.connect(self.increaseBrightness)
 
-        brightnessIcon = buxpaper.icon_from_commands(brightness_icon,
+        brightnessIcon = buxui.icon_from_commands(brightness_icon,
             self.increaseBrightnessButton.sizeHint().width(),
             self.increaseBrightnessButton.sizeHint().height())
         
-        label = buxpaper.Button(brightnessIcon)
+        label = buxui.Button(brightnessIcon)
         layout.addWidget(label, 0, 0)
         layout.addWidget(self.decreaseBrightnessButton, 0, 1)
         layout.addWidget(self.increaseBrightnessButton, 0, 2)
         
-        self.decreaseContrastButton = buxpaper.Button("-")
-        self.increaseContrastButton = buxpaper.Button("+")
+        self.decreaseContrastButton = buxui.Button("-")
+        self.increaseContrastButton = buxui.Button("+")
         self.decreaseContrastButton.clicked.connect(self.decreaseContrast)
         self.increaseContrastButton.clicked.connect(self.increaseContrast)
         
-        contrastIcon = buxpaper.icon_from_commands(contrast_icon,
+        contrastIcon = buxui.icon_from_commands(contrast_icon,
             self.increaseContrastButton.sizeHint().width(),
             self.increaseContrastButton.sizeHint().height())
         
-        label = buxpaper.Button(contrastIcon)
+        label = buxui.Button(contrastIcon)
         layout.addWidget(label, 1, 0)
         layout.addWidget(self.decreaseContrastButton, 1, 1)
         layout.addWidget(self.increaseContrastButton, 1, 2)
         
-        self.saveButton = buxpaper.Button(u"\u2713")
+        self.saveButton = buxui.Button(u"\u2713")
         self.saveButton.clicked.connect(self.saveSettings)
         layout.addWidget(self.saveButton, 0, 3, 2, 1)
     
@@ -494,7 +506,7 @@ if __name__ == "__main__":
     if not buxpaper.unlock(SecretGalleryDir, GalleryDir):
         sys.exit(1)
     
-    app = buxpaper.Application()
+    app = buxui.Application()
     window = Gallery()
     window.showFullScreen()
     sys.exit(app.exec_())
@@ -19,7 +19,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import sys
-import buxpaper
+import buxui
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
@@ -117,7 +117,7 @@ class ControlWidget(KeyWidget):
             self.update()
 
 
-class KeyboardWidget(buxpaper.Window):
+class KeyboardWidget(buxui.Window):
 
     rows = [("1234567890-=", '!"`$%^&*()_+'),
             ("qwertyuiop[]", "QWERTYUIOP{}"),
@@ -126,7 +126,7 @@ class KeyboardWidget(buxpaper.Window):
     
     def __init__(self, password = False):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         self.password = password
         self.text = u""
         
@@ -235,7 +235,7 @@ class KeyboardWidget(buxpaper.Window):
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     read_password = "--password" in app.arguments()
     kbd = KeyboardWidget(password = read_password)
     kbd.showFullScreen()
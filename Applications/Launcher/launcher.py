@@ -19,20 +19,33 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os, sys
-import buxpaper
+import buxpaper, buxui
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 
-class MenuWidget(buxpaper.Window):
+class MenuWidget(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         self.config = buxpaper.Config(buxpaper.settings + "-launcher")
         self.config.load()
         
+        # Rebuild the pages when the settings are changed by other processes,
+        # waiting until all the changes have been reported.
+        self.rebuildTimer = QTimer(self)
+        self.rebuildTimer.setSingleShot(True)
+        self.rebuildTimer.setInterval(0)
+        self.rebuildTimer.timeout.connect(self.rebuildPages)
+        self.rebuildPending = False
+        
+        self.configWatcher = buxui.ConfigWatcher(self.config, self)
+        self.configWatcher.changed.connect(self.settingChanged)
+        self.settingsWatcher = buxui.ConfigWatcher(buxpaper.config, self)
+        self.settingsWatcher.changed.connect(self.settingChanged)
+        
         self.this_appdir = os.path.abspath(os.path.split(__file__)[0])
         
         self.process = None
@@ -46,11 +59,11 @@ class MenuWidget(buxpaper.Window):
         self.panel.insertWidget(0, self.statusWidget)
         
         # Add buttons to the panel.
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.previousButton.clicked.connect(self.previousPage)
         self.panel.addWidget(self.previousButton)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.nextButton.clicked.connect(self.nextPage)
         self.panel.addWidget(self.nextButton)
         
@@ -71,8 +84,9 @@ class MenuWidget(buxpaper.Window):
         
         rows = self.config.get("Rows", 2)
         columns = self.config.get("Columns", 3)
-        width = self.config.get("Thumbnail width", buxpaper.thumbnail_size[0])
-        height = self.config.get("Thumbnail height", buxpaper.thumbnail_size[1])
+        thumbnail_size = buxpaper.config.get("thumbnail size", buxpaper.thumbnail_size)
+        width = self.config.get("Thumbnail width", thumbnail_size[0])
+        height = self.config.get("Thumbnail height", thumbnail_size[1])
         spacing = self.config.get("Thumbnail spacing", 12)
         row = column = 0
         
@@ -110,14 +124,14 @@ class MenuWidget(buxpaper.Window):
                 image = image.scaled(width, height, Qt.KeepAspectRatio,
                                      Qt.SmoothTransformation)
                 
-                button = buxpaper.Button(image)
+                button = buxui.Button(image)
                 button.data = appdir
                 button.clicked.connect(self.runApplication)
                 layout.addWidget(button)
                 # Apparently necessary to update the layout...
                 layout.setAlignment(button, Qt.AlignHCenter)
             
-            label = buxpaper.Label(name, appdir)
+            label = buxui.Label(name, appdir)
             label.setAlignment(Qt.AlignHCenter)
             label.setFrameShape(QFrame.NoFrame)
             label.clicked.connect(self.runApplication)
@@ -144,6 +158,31 @@ class MenuWidget(buxpaper.Window):
         
         self.pages.setCurrentIndex(0)
     
+    def settingChanged(self, key, value):
+    
+        # All of the launcher's own settings affect the pages, but only the
+        # thumbnail size is used from the general settings.
+        if self.sender() is self.configWatcher or key == "thumbnail size":
+            self.rebuildTimer.start()
+    
+    def rebuildPages(self):
+    
+        # Wait until any running application has finished, since its label
+        # would be destroyed.
+        if self.process:
+            self.rebuildPending = True
+            return
+        
+        self.rebuildPending = False
+        
+        while self.pages.count() > 0:
+            page = self.pages.widget(0)
+            self.pages.removeWidget(page)
+            page.deleteLater()
+        
+        self.loadApplicationDetails()
+        self.updateButtons()
+    
     def previousPage(self):
     
         self.pages.setCurrentIndex(self.pages.currentIndex() - 1)
@@ -162,6 +201,9 @@ class MenuWidget(buxpaper.Window):
         if not self.previousButton.isEnabled() and not self.nextButton.isEnabled():
             self.previousButton.hide()
             self.nextButton.hide()
+        else:
+            self.previousButton.show()
+            self.nextButton.show()
         
         self.statusWidget.updateStatus()
     
@@ -197,6 +239,9 @@ class MenuWidget(buxpaper.Window):
         self.processLabel.setEnabled(True)
         self.process = None
         self.statusWidget.updateStatus()
+        
+        if self.rebuildPending:
+            self.rebuildPages()
 
 
 class StatusWidget(QWidget):
@@ -249,7 +294,11 @@ class StatusWidget(QWidget):
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application(server = True)
+    # Only the server writes the settings, filling in any missing values so
+    # that they can be edited.
+    buxpaper.write_defaults()
+    
+    app = buxui.Application(server = True)
     w = MenuWidget()
     w.showFullScreen()
     sys.exit(app.exec_())
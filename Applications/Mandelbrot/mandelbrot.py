@@ -20,16 +20,16 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import sys
-import buxpaper
+import buxui
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 
-class Window(buxpaper.Window):
+class Window(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         self.mandelbrotWidget = MandelbrotWidget()
         
@@ -38,7 +38,7 @@ class Window(buxpaper.Window):
         self.mandelbrotWidget.viewChanged.connect(self.sleepButton.setEnabled)
         
         # Add a zoom button to the panel.
-        zoomOutButton = buxpaper.Button("-")
+        zoomOutButton = buxui.Button("-")
         zoomOutButton.clicked.connect(self.mandelbrotWidget.zoomOut)
         self.panel.addWidget(zoomOutButton)
         
@@ -226,7 +226,7 @@ class Worker(QThread):
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     w = Window()
     w.showFullScreen()
     sys.exit(app.exec_())
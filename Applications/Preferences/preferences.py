@@ -19,29 +19,29 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os, sys
-import buxpaper
+import buxpaper, buxui
 
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 
-class PreferencesWidget(buxpaper.Window):
+class PreferencesWidget(buxui.Window):
 
     ThumbnailSize = QSize(buxpaper.thumbnail_size[0],
                           buxpaper.thumbnail_size[1])
     
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
-        self.pages = buxpaper.PagedWidget()
+        self.pages = buxui.PagedWidget()
         self.pages.previousButton.hide()
         self.pages.nextButton.hide()
         self.pages.padding = 12
         
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.panel.addWidget(self.previousButton)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.panel.addWidget(self.nextButton)
         
         self.pages.previousButtonState.connect(self.previousButton.setEnabled)
@@ -140,6 +140,9 @@ class PreferencesWidget(buxpaper.Window):
             os.remove(link_path)
         
         os.symlink(path, os.path.join(self.start_dir, name))
+        
+        # Also save a copy that can be shown at boot without loading Qt.
+        buxui.save_frame(QImage(path), os.path.join(buxpaper.framedir, "Start.raw"))
     
     @pyqtSlot(QAbstractButton)
     def setSleepPicture(self, button):
@@ -154,11 +157,12 @@ class PreferencesWidget(buxpaper.Window):
             os.remove(link_path)
         
         os.symlink(path, os.path.join(self.sleep_dir, name))
+        buxui.save_frame(QImage(path), os.path.join(buxpaper.framedir, "Sleep.raw"))
 
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     w = PreferencesWidget()
     w.showFullScreen()
     sys.exit(app.exec_())
@@ -18,16 +18,16 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os, sys
-import buxpaper
+import buxpaper, buxui, mxink
 
 from PyQt4.QtCore import pyqtSignal, QPoint, QPointF, QRect, QSize, Qt
 from PyQt4.QtGui import *
 
-class Window(buxpaper.Window):
+class Window(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
         self.viewer = Viewer()
         self.viewer.pageShown.connect(self.updatePageButtons)
@@ -39,29 +39,29 @@ class Window(buxpaper.Window):
         self.sleepButton.clicked.connect(self.setSleepImage)
         self.sleepButton.show()
         
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.previousButton.clicked.connect(self.documentList.previousPage)
         self.documentList.previousButtonState.connect(self.previousButton.setEnabled)
         self.panel.addWidget(self.previousButton)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.nextButton.clicked.connect(self.documentList.nextPage)
         self.documentList.nextButtonState.connect(self.nextButton.setEnabled)
         self.panel.addWidget(self.nextButton)
         
-        self.backButton = buxpaper.Button(u"\u00ab")
+        self.backButton = buxui.Button(u"\u00ab")
         self.backButton.clicked.connect(self.viewer.backMany)
         self.panel.addWidget(self.backButton)
         
-        self.forwardButton = buxpaper.Button(u"\u00bb")
+        self.forwardButton = buxui.Button(u"\u00bb")
         self.forwardButton.clicked.connect(self.viewer.forwardMany)
         self.panel.addWidget(self.forwardButton)
         
-        self.fontSizeButton = buxpaper.Button("F")
+        self.fontSizeButton = buxui.Button("F")
         self.fontSizeButton.clicked.connect(self.setFontSize)
         self.panel.addWidget(self.fontSizeButton)
         
-        self.documentButton = buxpaper.Button("B")
+        self.documentButton = buxui.Button("B")
         self.documentButton.clicked.connect(self.chooseDocument)
         self.panel.addWidget(self.documentButton)
         
@@ -123,8 +123,7 @@ class Window(buxpaper.Window):
     
     def setSleepImage(self):
     
-        image = QImage(self.viewer.size(), QImage.Format_RGB16)
-        self.viewer.render(image)
+        image = self.grabWidget(self.viewer)
         
         self.sleepButton.setEnabled(False)
         self.saveSleepImage(image)
@@ -143,7 +142,7 @@ class FontChooser(QDialog):
         for i in range(-4, 6, 2):
             f = QFont(font)
             f.setPointSize(font.pointSize() + i)
-            button = buxpaper.Button("F")
+            button = buxui.Button("F")
             button.setFont(f)
             button.clicked.connect(self.chooseFont)
             layout.addWidget(button)
@@ -156,13 +155,13 @@ class FontChooser(QDialog):
         self.accept()
 
 
-class DocumentChooser(buxpaper.PagedWidget):
+class DocumentChooser(buxui.PagedWidget):
 
     chosen = pyqtSignal(unicode)
     
     def __init__(self, parent = None):
     
-        buxpaper.PagedWidget.__init__(self, parent)
+        buxui.PagedWidget.__init__(self, parent)
         self.previousButton.hide()
         self.nextButton.hide()
     
@@ -174,7 +173,7 @@ class DocumentChooser(buxpaper.PagedWidget):
         for name in names:
         
             doc_path = os.path.join(buxpaper.docdir, name)
-            label = buxpaper.Label(name, doc_path)
+            label = buxui.Label(name, doc_path)
             label.setFrameShape(QFrame.NoFrame)
             label.adjustSize()
             label.clicked.connect(self.chooseDocument)
@@ -203,10 +202,17 @@ class Viewer(QWidget):
         self.page = 0
         self.paragraphs = []
         self.paragraph_index = [(0, 0)]
+        self.index_changed = False
+        self.index_appended = []
         self.image = QImage()
         
-        self.config = buxpaper.Config(buxpaper.settings + "-reader")
+        self.config = buxpaper.JournalConfig(buxpaper.settings + "-reader")
         self.config.load()
+        
+        # Clear the ghosting left by partial updates every few pages.
+        self.refreshPolicy = mxink.PageCountPolicy(
+            self.config.get("Pages between full refreshes", 6))
+        self.display = buxui.DisplayUpdater(self.refreshPolicy, parent = self)
     
     def mousePressEvent(self, event):
     
@@ -230,6 +236,8 @@ class Viewer(QWidget):
         painter.begin(self)
         painter.drawImage(event.rect(), self.image, event.rect())
         painter.end()
+        
+        self.display.update(self, event.rect())
     
     def showEvent(self, event):
     
@@ -250,10 +258,25 @@ class Viewer(QWidget):
         
             self.paragraphs.append(paragraph.lstrip(u"\n").replace(u"\n", u" "))
         
+        # The page and paragraph index are stored under their own keys so that
+        # turning the page only records the page number and any new entries
+        # in the index. Older versions stored them together under the
+        # document's path.
         details = self.config.get(self.document, {"Page": 0, "Index": [(0, 0)]})
+        index = self.config.get(u"Index:" + self.document, None)
+        
+        self.page = self.config.get(u"Page:" + self.document, details["Page"])
+        
+        # Keep a copy of the index so that entries can be added to the one held
+        # by the configuration separately.
+        if index is None:
+            self.paragraph_index = list(details["Index"])
+            self.index_changed = True
+        else:
+            self.paragraph_index = list(index)
+            self.index_changed = False
         
-        self.page = details["Page"]
-        self.paragraph_index = details["Index"]
+        self.index_appended = []
         
         self.showPage()
     
@@ -286,10 +309,19 @@ class Viewer(QWidget):
         painter = self.new_page()
         
         self.formatPage(painter)
+        self.refreshPolicy.page_turned()
         
         if self.document:
-            self.config.set(self.document, {"Page": self.page,
-                                            "Index": self.paragraph_index})
+            self.config.set(u"Page:" + self.document, self.page)
+            if self.index_changed:
+                self.config.set(u"Index:" + self.document,
+                                list(self.paragraph_index))
+            else:
+                for entry in self.index_appended:
+                    self.config.append(u"Index:" + self.document, entry)
+        
+        self.index_changed = False
+        self.index_appended = []
         
         self.pageShown.emit(self.page)
     
@@ -372,8 +404,10 @@ class Viewer(QWidget):
         if current < len(self.paragraphs):
             if self.page == len(self.paragraph_index) - 1:
                 self.paragraph_index.append((current, start))
-            else:
+                self.index_appended.append((current, start))
+            elif tuple(self.paragraph_index[self.page + 1]) != (current, start):
                 self.paragraph_index[self.page + 1] = (current, start)
+                self.index_changed = True
     
     def hasPreviousPage(self):
     
@@ -430,6 +464,7 @@ class Viewer(QWidget):
         
         self.page = 0
         self.paragraph_index = [(0, 0)]
+        self.index_changed = True
         
         while self.paragraph_index[-1][0] < current:
             self.formatPage()
@@ -449,12 +484,12 @@ class Viewer(QWidget):
     
     def saveConfiguration(self):
     
-        self.config.save()
+        self.config.flush()
 
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     
     window = Window()
     window.showFullScreen()
@@ -18,19 +18,19 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os, sys, time
-import buxpaper
+import buxpaper, buxui, mxink
 
 from PyQt4.QtCore import pyqtSignal, QPoint, QPointF, QRect, QSize, QString, \
                                      Qt, QTimer
 from PyQt4.QtGui import *
 
-class Window(buxpaper.Window):
+class Window(buxui.Window):
 
     def __init__(self):
     
-        buxpaper.Window.__init__(self)
+        buxui.Window.__init__(self)
         
-        self.config = buxpaper.Config(buxpaper.settings + "-sketch")
+        self.config = buxpaper.Config(buxpaper.settings + "-sketch", delay = 5)
         self.config.load()
         
         self.viewer = Viewer(self.config)
@@ -43,25 +43,25 @@ class Window(buxpaper.Window):
         self.sleepButton.clicked.connect(self.setSleepImage)
         self.sleepButton.show()
         
-        browserIcon = buxpaper.icon_from_commands(buxpaper.browser_icon,
+        browserIcon = buxui.icon_from_commands(buxui.browser_icon,
             self.closeButton.sizeHint().width(), self.closeButton.sizeHint().height())
         
         # Viewer buttons
         
         # Add a button for accessing the image browser.
-        self.browserButton = buxpaper.Button(browserIcon)
+        self.browserButton = buxui.Button(browserIcon)
         self.browserButton.clicked.connect(self.showBrowser)
         self.panel.addWidget(self.browserButton)
         
-        self.annotateButton = buxpaper.Button(u"T")
+        self.annotateButton = buxui.Button(u"T")
         self.annotateButton.clicked.connect(self.annotateDocument)
         self.panel.addWidget(self.annotateButton)
         
-        self.clearButton = buxpaper.Button(u"\u2718")
+        self.clearButton = buxui.Button(u"\u2718")
         self.clearButton.clicked.connect(self.clearDocument)
         self.panel.addWidget(self.clearButton)
         
-        self.storeButton = buxpaper.Button(u"\u2714")
+        self.storeButton = buxui.Button(u"\u2714")
         self.storeButton.setEnabled(False)
         self.storeButton.clicked.connect(self.storeDocument)
         self.viewer.saved.connect(self.storeButton.setDisabled)
@@ -70,12 +70,12 @@ class Window(buxpaper.Window):
         # Browser buttons
         
         # Add a button to allow creation of a new document.
-        self.newButton = buxpaper.Button(u"+")
+        self.newButton = buxui.Button(u"+")
         self.newButton.clicked.connect(self.newDocument)
         self.panel.addWidget(self.newButton)
         
         # Add navigation buttons.
-        self.previousButton = buxpaper.Button(u"\u25c4")
+        self.previousButton = buxui.Button(u"\u25c4")
         self.previousButton.clicked.connect(self.previousPage)
         self.panel.addWidget(self.previousButton)
         self.documentList.hasPrevious.connect(self.previousButton.setEnabled)
@@ -83,7 +83,7 @@ class Window(buxpaper.Window):
         self.viewer.changed.connect(self.sleepButton.setEnabled)
         self.viewer.changed.connect(self.storeButton.setEnabled)
         
-        self.nextButton = buxpaper.Button(u"\u25ba")
+        self.nextButton = buxui.Button(u"\u25ba")
         self.nextButton.clicked.connect(self.nextPage)
         self.panel.addWidget(self.nextButton)
         self.documentList.hasNext.connect(self.nextButton.setEnabled)
@@ -303,13 +303,13 @@ class DocumentChooser(QWidget):
                 image = QImage(width, height, QImage.Format_RGB16)
                 image.fill(Qt.gray)
             
-            button = buxpaper.Button(image)
+            button = buxui.Button(image)
             button.data = drawing_path
             button.clicked.connect(self.chooseDocument)
             layout.addWidget(button)
             layout.setAlignment(button, Qt.AlignHCenter)
             
-            label = buxpaper.Label(name, drawing_path)
+            label = buxui.Label(name, drawing_path)
             label.setAlignment(Qt.AlignHCenter)
             label.setWordWrap(True)
             label.setFrameShape(QFrame.NoFrame)
@@ -393,15 +393,15 @@ class AnnotationDialog(QDialog):
         layout.addStretch()
         
         buttons = QHBoxLayout()
-        editButton = buxpaper.Label(self.tr("Edit"))
+        editButton = buxui.Label(self.tr("Edit"))
         editButton.clicked.connect(self.editText)
         buttons.addWidget(editButton)
         
-        updateButton = buxpaper.Label(self.tr("Update"))
+        updateButton = buxui.Label(self.tr("Update"))
         updateButton.clicked.connect(self.accept)
         buttons.addWidget(updateButton)
         
-        discardButton = buxpaper.Label(self.tr("Discard"))
+        discardButton = buxui.Label(self.tr("Discard"))
         discardButton.clicked.connect(self.reject)
         buttons.addWidget(discardButton)
         
@@ -555,6 +555,12 @@ class Viewer(QWidget):
         self.config = config
         self.pressed = False
         
+        # Draw strokes with fast monochrome updates, and only clear the
+        # ghosting they leave between strokes.
+        self.strokePolicy = mxink.StrokePolicy()
+        self.display = buxui.DisplayUpdater(self.strokePolicy, mxink.FAST,
+                                            parent = self)
+        
         self.document = Document()
         document = self.config.get("Current", None)
         self.openDocument(document)
@@ -562,6 +568,7 @@ class Viewer(QWidget):
     def mousePressEvent(self, event):
     
         self.pressed = True
+        self.strokePolicy.begin_stroke()
         
         p1 = QPoint(event.pos())
         self.document.addPoint(p1)
@@ -593,6 +600,7 @@ class Viewer(QWidget):
     def mouseReleaseEvent(self, event):
     
         self.pressed = False
+        self.strokePolicy.end_stroke()
         self.document.makeObject()
         
         # Update the areas covered by the lines in the last object.
@@ -608,6 +616,8 @@ class Viewer(QWidget):
         painter.begin(self)
         self.document.paint(painter)
         painter.end()
+        
+        self.display.update(self, event.rect())
     
     def openDocument(self, path):
     
@@ -624,7 +634,7 @@ class Viewer(QWidget):
     
     def saveConfiguration(self):
     
-        self.config.save()
+        self.config.flush()
     
     def clearDocument(self):
     
@@ -640,7 +650,7 @@ class Viewer(QWidget):
 
 if __name__ == "__main__":
 
-    app = buxpaper.Application()
+    app = buxui.Application()
     
     window = Window()
     window.showFullScreen()
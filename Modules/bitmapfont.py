@@ -0,0 +1,214 @@
+"""
+bitmapfont.py - Pre-rasterised fonts for drawing text without Qt.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array, os, struct, zlib
+
+# Fonts are cached in this directory, with the most recently generated font
+# also stored as the default font.
+font_dir = os.path.abspath(os.path.join(os.getenv("HOME", ""), ".buxpaper-fonts"))
+default_path = os.path.join(font_dir, "default.bxf")
+
+# Printable ASCII and Latin-1 characters.
+default_characters = u"".join(map(unichr, range(32, 127) + range(160, 256)))
+
+# The file header contains the height, ascent and number of glyphs of the
+# font and the width of its glyph atlas. Each glyph record contains the
+# character code, the glyph's position and width in the atlas, its offset
+# from the pen position and its advance. The atlas follows, compressed, with
+# one bit for each pixel and each row padded to a whole number of bytes.
+_magic = "BXF1"
+_header = struct.Struct("<4sHHHI")
+_glyph = struct.Struct("<IIHhH")
+
+class Glyph:
+
+    """Describes a character as a list of (row, start, length) spans of set
+    pixels, relative to the top of the font and the pen position."""
+    
+    def __init__(self, advance, spans):
+    
+        self.advance = advance
+        self.spans = spans
+
+
+class BitmapFont:
+
+    """A 1-bit font held as a glyph atlas, with glyphs decoded into spans of
+    pixels the first time they are used."""
+    
+    def __init__(self, height, ascent, atlas_width, atlas, records):
+    
+        self.height = height
+        self.ascent = ascent
+        self.atlas_width = atlas_width
+        self.atlas = atlas
+        self.records = records
+        self._glyphs = {}
+        self._row_length = (atlas_width + 7) / 8
+    
+    def glyph(self, character):
+    
+        """Returns the Glyph for the character, or for a question mark if the
+        font does not contain it."""
+        
+        try:
+            return self._glyphs[character]
+        except KeyError:
+            pass
+        
+        code = ord(character)
+        if code not in self.records:
+            if character == u"?":
+                return Glyph(0, [])
+            return self.glyph(u"?")
+        
+        x, width, left, advance = self.records[code]
+        spans = []
+        
+        for row in xrange(self.height):
+        
+            start = row * self._row_length
+            bits = self.atlas[start:start + self._row_length]
+            run = None
+            
+            for i in xrange(width + 1):
+            
+                if i < width:
+                    p = x + i
+                    lit = bits[p >> 3] & (0x80 >> (p & 7))
+                else:
+                    lit = False
+                
+                if lit and run is None:
+                    run = i
+                elif not lit and run is not None:
+                    spans.append((row, left + run, i - run))
+                    run = None
+        
+        glyph = self._glyphs[character] = Glyph(advance, spans)
+        return glyph
+    
+    def width(self, text):
+    
+        return sum(map(lambda c: self.glyph(c).advance, text))
+    
+    def save(self, path):
+    
+        directory = os.path.split(path)[0]
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        data = [_header.pack(_magic, self.height, self.ascent,
+                             len(self.records), self.atlas_width)]
+        for code, (x, width, left, advance) in sorted(self.records.items()):
+            data.append(_glyph.pack(code, x, width, left, advance))
+        
+        data.append(zlib.compress(self.atlas.tostring()))
+        
+        # Write the font to a temporary file first so that readers never see
+        # a partially written font.
+        temp_path = path + ".new"
+        f = open(temp_path, "wb")
+        f.write("".join(data))
+        f.close()
+        os.rename(temp_path, path)
+
+
+def load(path):
+
+    """Loads a font saved by BitmapFont.save()."""
+    
+    data = open(path, "rb").read()
+    magic, height, ascent, count, atlas_width = _header.unpack_from(data)
+    
+    if magic != _magic:
+        raise ValueError("%s is not a bitmap font file." % path)
+    
+    records = {}
+    offset = _header.size
+    for i in range(count):
+        code, x, width, left, advance = _glyph.unpack_from(data, offset)
+        records[code] = (x, width, left, advance)
+        offset += _glyph.size
+    
+    atlas = array.array("B", zlib.decompress(data[offset:]))
+    return BitmapFont(height, ascent, atlas_width, atlas, records)
+
+def font_path(family, size):
+
+    name = "%s-%i.bxf" % (family.replace(" ", "_").replace(os.sep, "_"), size)
+    return os.path.join(font_dir, name)
+
+def rasterise(family, size, characters = default_characters):
+
+    """Renders the characters using Qt with the given font family and point
+    size, returning a BitmapFont. A QApplication must exist."""
+    
+    from PyQt4.QtCore import Qt
+    from PyQt4.QtGui import QColor, QFont, QFontMetrics, QImage, QPainter
+    
+    font = QFont(family)
+    font.setPointSize(size)
+    font.setStyleStrategy(QFont.NoAntialias)
+    fm = QFontMetrics(font)
+    
+    height = fm.height()
+    ascent = fm.ascent()
+    
+    # Find the extent of each glyph relative to the pen position.
+    extents = []
+    x = 0
+    for character in characters:
+    
+        if not fm.inFont(character):
+            continue
+        
+        advance = fm.width(character)
+        bounds = fm.boundingRect(character)
+        left = min(0, bounds.x())
+        width = max(advance, bounds.x() + bounds.width()) - left
+        extents.append((ord(character), x, width, left, advance))
+        x += width
+    
+    atlas_width = max(1, x)
+    image = QImage(atlas_width, height, QImage.Format_RGB32)
+    image.fill(QColor(Qt.white).rgb())
+    
+    painter = QPainter()
+    painter.begin(image)
+    painter.setFont(font)
+    painter.setPen(Qt.black)
+    for code, x, width, left, advance in extents:
+        painter.drawText(x - left, ascent, unichr(code))
+    painter.end()
+    
+    # Pack the dark pixels of the image into the atlas.
+    row_length = (atlas_width + 7) / 8
+    atlas = array.array("B", [0] * (row_length * height))
+    
+    for y in range(height):
+        for x in range(atlas_width):
+            if QColor(image.pixel(x, y)).value() < 128:
+                atlas[y * row_length + (x >> 3)] |= 0x80 >> (x & 7)
+    
+    records = {}
+    for code, x, width, left, advance in extents:
+        records[code] = (x, width, left, advance)
+    
+    return BitmapFont(height, ascent, atlas_width, atlas, records)
@@ -15,18 +15,104 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import codecs, os, subprocess, sys
+import array, atexit, base64, codecs, os, subprocess, sys, threading, zlib
 from json import JSONEncoder, JSONDecoder
 
+# Lists of at least this many pairs of integers, such as the paragraph index
+# of a document, are stored as a compressed string of 32-bit little-endian
+# values instead of as JSON lists. They are decoded the first time they are
+# obtained from a Config.
+packed_pairs_key = "Packed integer pairs"
+packed_pairs_minimum = 16
+
+def _is_pair(item):
+
+    return isinstance(item, (list, tuple)) and len(item) == 2 and \
+           type(item[0]) in (int, long) and type(item[1]) in (int, long)
+
+def pack_value(value):
+
+    """Returns the value with any long lists of integer pairs, either as the
+    value itself or in the values of dictionaries it contains, replaced by
+    dictionaries containing their packed form."""
+    
+    if isinstance(value, dict):
+        packed = {}
+        for key, item in value.items():
+            packed[key] = pack_value(item)
+        return packed
+    
+    if not isinstance(value, (list, tuple)) or len(value) < packed_pairs_minimum:
+        return value
+    
+    for item in value:
+        if not _is_pair(item):
+            return value
+    
+    try:
+        values = array.array("i", [v for pair in value for v in pair])
+    except OverflowError:
+        return value
+    
+    if values.itemsize != 4:
+        return value
+    if sys.byteorder == "big":
+        values.byteswap()
+    
+    return {packed_pairs_key: base64.b64encode(zlib.compress(values.tostring()))}
+
+def unpack_value(value):
+
+    """Returns the value with any packed lists of integer pairs replaced by
+    lists of tuples. The value itself is returned if nothing was packed."""
+    
+    if not isinstance(value, dict):
+        return value
+    
+    if packed_pairs_key in value:
+        values = array.array("i", zlib.decompress(base64.b64decode(value[packed_pairs_key])))
+        if sys.byteorder == "big":
+            values.byteswap()
+        return zip(values[0::2], values[1::2])
+    
+    unpacked = None
+    for key, item in value.items():
+        new = unpack_value(item)
+        if new is not item:
+            if unpacked is None:
+                unpacked = value.copy()
+            unpacked[key] = new
+    
+    if unpacked is None:
+        return value
+    return unpacked
+
 class Config:
 
-    def __init__(self, path, values = None):
+    """Holds settings that are read from and written to a JSON file. If a
+    delay in seconds is given, set() marks the settings as changed and they
+    are written in the background once no more changes have been made for
+    that time, so that a burst of changes causes a single write. Unsaved
+    changes are also written when the program exits. Setting a key to the
+    value it had when the settings were last loaded or saved does not mark
+    them as changed."""
+    
+    def __init__(self, path, values = None, delay = None):
     
         self.path = path
         if values:
             self.values = values
         else:
             self.values = {}
+        
+        self.delay = delay
+        self.dirty = False
+        self._saved = {}
+        self._timer = None
+        self._lock = threading.RLock()
+        
+        if delay is not None:
+            atexit.register(self.flush)
     
     def load(self):
     
@@ -40,654 +126,271 @@ class Config:
         except ValueError:
             return False
         
+        self._saved = self._encode_values(self.values)
         return True
     
     def save(self):
     
-        try:
-            f = codecs.open(self.path, "w", "utf8")
-            f.write(JSONEncoder().encode(self.values))
-            f.close()
-        except IOError:
-            return False
+        """Writes the settings to the file, replacing the old file only when
+        the new one has been completely written."""
         
-        return True
-    
-    def get(self, key, default):
+        self._lock.acquire()
+        try:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            
+            values = pack_value(self.values)
+            temp_path = self.path + ".new"
+            try:
+                f = open(temp_path, "wb")
+                f.write(JSONEncoder().encode(values))
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+                os.rename(temp_path, self.path)
+            except (IOError, OSError):
+                return False
+            
+            self._saved = self._encode_values(values)
+            self.dirty = False
+            return True
+        finally:
+            self._lock.release()
     
-        return self.values.get(key, default)
+    def flush(self):
     
-    def set(self, key, value):
+        """Writes the settings if they have changed since they were last
+        saved."""
+        
+        self._lock.acquire()
+        try:
+            if not self.dirty:
+                return True
+            return self.save()
+        finally:
+            self._lock.release()
     
-        self.values[key] = value
-
-
-# Load the configuration file and set the path so that the PyQt modules can be
-# imported.
-settings = os.path.abspath(os.path.join(os.getenv("HOME", ""), ".buxpaper"))
-
-config = Config(settings)
-
-path = config.get("PYTHONPATH", "/usr/local/arm-linux-gnueabi/lib/python2.6/site-packages")
-sys.path.append(path)
-
-fbdev = config.get("framebuffer device", "/dev/fb0")
-touchinput = config.get("touch input driver", "linuxinput:/dev/input/event1")
-
-appdir = config.get("applications directory",
-                    os.path.join(os.path.split(settings)[0], "Applications"))
-docdir = config.get("documents directory",
-                    os.path.join(os.path.split(settings)[0], "Documents"))
-picdir = config.get("pictures directory",
-                    os.path.join(os.path.split(settings)[0], "Pictures"))
-drawdir = config.get("drawings directory",
-                     os.path.join(os.path.split(settings)[0], "Drawings"))
-
-thumbnail_size = config.get("thumbnail size", [180, 180])
-
-# Write the default values back to the configuration file.
-config.set("PYTHONPATH", path)
-config.set("framebuffer device", fbdev)
-config.set("touch input device", touchinput)
-
-config.set("applications directory", appdir)
-config.set("documents directory", docdir)
-config.get("pictures directory", picdir)
-config.get("drawings directory", drawdir)
-
-config.save()
-
-
-# Application and framebuffer handling classes and modules.
-
-from PyQt4.QtCore import QPoint, QRect, QSize, Qt, pyqtSignal
-from PyQt4.QtGui import *
-
-import linuxfb
-
-class Application(QApplication):
-
-    def __init__(self, server = False):
+    def get(self, key, default):
     
-        argv = sys.argv[:]
-        
-        if server and "-qws" not in argv:
-            argv.append("-qws")
-        
-        # Set the touch input driver before starting the application.
-        QWSServer.setDefaultMouse(touchinput)
-        
-        QApplication.__init__(self, argv)
+        if key not in self.values:
+            return default
         
-        # Set the default font to something readable.
-        font_family = config.get("font", "DejaVu Serif")
-        font_size = int(config.get("font size", 24))
+        # Keep the unpacked form of the value so that it is only unpacked
+        # once.
+        value = self.values[key]
+        unpacked = unpack_value(value)
+        if unpacked is not value:
+            self.values[key] = unpacked
         
-        font = QFont(font_family)
-        font.setPointSize(font_size)
-        self.setFont(font)
-        
-        # Set the default palette to use white as the background colour.
-        palette = QPalette()
-        palette.setColor(QPalette.Window, Qt.white)
-        self.setPalette(palette)
+        return unpacked
     
-    def display_and_quit(self, widget):
+    def set(self, key, value):
     
-        fb = linuxfb.Framebuffer(fbdev)
-        vi = fb.virtual_screen_info()
-        
-        widget.resize(vi.xres, vi.yres)
-        self.processEvents()
-        
-        image = QImage(vi.xres, vi.yres, QImage.Format_RGB16)
-        p = QPainter()
-        p.begin(image)
-        widget.render(p)
-        p.end()
-        
-        b = fb.get_buffer()
-        data = image.bits()
-        data.setsize(image.byteCount())
-        b[:] = data.asstring()
-        
-        self.quit()
-
-def top_layout():
-
-    desktop = QApplication.desktop()
-    geometry = desktop.screenGeometry()
+        self._lock.acquire()
+        try:
+            self.values[key] = value
+            
+            # Compare the value with the one that was saved rather than the
+            # one in memory, which may be the same object modified in place.
+            if self._saved.get(key) == JSONEncoder().encode(pack_value(value)):
+                return
+            
+            self.dirty = True
+            
+            if self.delay is not None:
+                if self._timer:
+                    self._timer.cancel()
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        finally:
+            self._lock.release()
     
-    if geometry.width() < geometry.height():
-        return QVBoxLayout, QHBoxLayout
-    else:
-        return QHBoxLayout, QVBoxLayout
-
-def layout(n):
-    "Returns the appropriate class for the nth layout in a window."
-    return top_layout()[n % 2]
+    def _encode_values(self, values):
+    
+        encoder = JSONEncoder()
+        return dict((key, encoder.encode(value)) for key, value in values.items())
 
-colourScheme = {" ": "\x00\x00\x00\x00",
-                ".": "\x00\x00\x00\xff",
-                "x": "\x80\x80\x80\xff"}
 
-def icon_from_sequence(sequence, palette = colourScheme):
+class JournalConfig(Config):
 
-    height = len(sequence)
-    width = len(sequence[0])
+    """Holds settings in a JSON file with a journal of the changes made since
+    the file was last written. Each call to set() or append() adds a record
+    to the journal, and the file is only rewritten when the journal grows
+    larger than the given number of bytes."""
     
-    data = "".join(map(lambda x: colourScheme.get(x, "\x00\x00\x00\x00"), "".join(sequence)))
+    def __init__(self, path, values = None, limit = 65536):
     
-    return QIcon(QPixmap.fromImage(QImage(data, width, height, QImage.Format_ARGB32)))
-
-def icon_from_commands(sequence, width, height, palette = colourScheme):
-
-    image = QImage(width, height, QImage.Format_ARGB32)
-    painter = QPainter()
-    painter.begin(image)
+        Config.__init__(self, path, values)
+        self.journal_path = path + ".journal"
+        self.limit = limit
+        self._encoder = JSONEncoder(separators = (",", ":"))
     
-    for command, arguments in sequence:
+    def load(self):
     
-        if "pen" not in arguments:
-            arguments["pen"] = QColor(0, 0, 0, 0)
-        if "brush" not in arguments:
-            arguments["brush"] = QColor(0, 0, 0, 0)
+        """Loads the settings and replays the journal, returning False if
+        neither exists."""
         
-        if command == "fill":
-            painter.fillRect(QRect(0, 0, width, height), QColor(arguments["brush"]))
+        loaded = Config.load(self)
         
-        elif command == "polygon":
-            painter.setPen(QColor(arguments["pen"]))
-            painter.setBrush(QColor(arguments["brush"]))
-            painter.drawPolygon(QPolygon(map(lambda (x, y):
-                                         QPoint(x * width, y * height),
-                                         arguments["points"])))
-        
-        elif command == "polyline":
-            painter.setPen(QColor(arguments["pen"]))
-            painter.setBrush(QColor(arguments["brush"]))
-            painter.drawPolyline(QPolygon(map(lambda (x, y):
-                                          QPoint(x * width, y * height),
-                                          arguments["points"])))
-        
-        elif command == "pie":
-            painter.setPen(QColor(arguments["pen"]))
-            painter.setBrush(QColor(arguments["brush"]))
-            painter.drawPie(QRect(arguments["rect"][0] * width,
-                                  arguments["rect"][1] * height,
-                                  arguments["rect"][2] * width,
-                                  arguments["rect"][3] * height),
-                            arguments["start"], arguments["span"])
-    
-    painter.end()
-    
-    return QIcon(QPixmap.fromImage(image))
-
-
-browser_icon = (
-    ("fill", {"brush": "white"}),
-    ("polygon", {"pen": "black", "brush": "#404040",
-                 "points": ((0.2, 0.1), (0.4, 0.1), (0.5, 0.2),
-                            (0.85, 0.2), (0.9, 0.25), (0.9, 0.9),
-                            (0.1, 0.9), (0.1, 0.2))}),
-    ("polygon", {"pen": "black", "brush": "black",
-                 "points": ((0.2, 0.3), (0.9, 0.3))})
-    )
-
-sleep_icon = (
-    ("fill", {"brush": "white"}),
-    ("polygon", {"brush": "black",
-                 "points": ((0.1, 0.5), (0.5, 0.5), (0.5, 0.6), (0.2, 0.8),
-                            (0.5, 0.8), (0.5, 0.9), (0.1, 0.9), (0.1, 0.8),
-                            (0.4, 0.6), (0.1, 0.6))}),
-    ("polygon", {"brush": "#404040",
-                 "points": ((0.5, 0.1), (0.9, 0.1), (0.9, 0.2), (0.6, 0.4),
-                            (0.9, 0.4), (0.9, 0.5), (0.5, 0.5), (0.5, 0.4),
-                            (0.8, 0.2), (0.5, 0.2))})
-    )
-
-class Window(QWidget):
-
-    def __init__(self):
-    
-        QWidget.__init__(self)
-        
-        self.closeButton = Button(u"\u2716")
-        self.closeButton.clicked.connect(self.close)
-        
-        sleepIcon = icon_from_commands(sleep_icon,
-            self.closeButton.sizeHint().width(),
-            self.closeButton.sizeHint().height())
-        
-        self.sleepButton = Button(sleepIcon)
-        self.sleepButton.hide()
-        
-        OuterLayout, InnerLayout = top_layout()
-        layout = OuterLayout(self)
-        self.panel = InnerLayout()
-        
-        self.panel.addWidget(self.closeButton)
-        self.panel.addStretch()
-        self.panel.addWidget(self.sleepButton)
-        self.panel.addStretch()
+        try:
+            lines = open(self.journal_path, "rb").read().split("\n")
+        except IOError:
+            return loaded
         
-        self.contentWidget = QWidget()
+        decoder = JSONDecoder()
+        for line in lines:
         
-        layout.addLayout(self.panel)
-        layout.addWidget(self.contentWidget, 1)
-    
-    def setSleepImage(self):
-    
-        # The default implementation takes a screenshot of the content widget.
-        image = QImage(self.contentWidget.size(), QImage.Format_RGB16)
-        self.contentWidget.render(image)
+            # Skip empty lines and records that were not completely written.
+            try:
+                record = decoder.decode(line)
+            except ValueError:
+                continue
+            
+            if len(record) == 3 and record[2] == "append":
+                key, item = record[:2]
+                value = unpack_value(self.values.get(key, []))
+                value.append(tuple(item))
+                self.values[key] = value
+            elif len(record) == 2:
+                key, value = record
+                self.values[key] = value
         
-        self.saveSleepImage(image)
+        return True
     
-    def saveSleepImage(self, image):
+    def save(self):
     
-        sleep_dir = os.path.join(picdir, "Sleep")
+        """Writes all the settings to the file and empties the journal."""
         
-        # Remove any existing images in the directory.
-        for name in os.listdir(sleep_dir):
-            os.remove(os.path.join(sleep_dir, name))
-        
-        # Reduce the image if necessary.
-        size = QApplication.desktop().geometry().size()
-        if image.width() > size.width() or image.height() > size.height():
-            image = image.scaled(size, Qt.KeepAspectRatio)
-        
-        # Pad the image if necessary.
-        if image.size() != size:
-        
-            sleepImage = QImage(size, QImage.Format_RGB16)
-            sleepImage.fill(QColor(255, 255, 255))
+        self._lock.acquire()
+        try:
+            if not Config.save(self):
+                return False
             
-            p = QPainter()
-            p.begin(sleepImage)
-            p.drawImage((sleepImage.width() - image.width())/2,
-                        (sleepImage.height() - image.height())/2, image)
-            p.end()
+            try:
+                os.remove(self.journal_path)
+            except OSError:
+                pass
             
-            image = sleepImage
-        
-        # Save the image to the directory.
-        image.save(os.path.join(sleep_dir, "saved.png"))
-
-class Button(QWidget):
-
-    pressed = pyqtSignal()
-    clicked = pyqtSignal()
-    released = pyqtSignal()
+            return True
+        finally:
+            self._lock.release()
     
-    def __init__(self, contents, parent = None):
+    def flush(self):
     
-        QWidget.__init__(self, parent)
+        """Ensures that the journal has been written to the storage device."""
         
-        self.contents = contents
-        self._pressed = False
-        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        try:
+            f = open(self.journal_path, "ab")
+            os.fsync(f.fileno())
+            f.close()
+        except (IOError, OSError):
+            return False
         
-        font = QFont(QApplication.font())
-        font.setPointSize(font.pointSize() * 1.5)
-        self.setFont(font)
-    
-    def mousePressEvent(self, event):
-    
-        if not self._pressed:
-            self._pressed = True
-            self.pressed.emit()
+        return True
     
-    def mouseReleaseEvent(self, event):
+    def set(self, key, value):
     
-        if self._pressed:
-            self._pressed = False
-            self.clicked.emit()
-            self.released.emit()
+        self._lock.acquire()
+        try:
+            self.values[key] = value
+            self._write_record([key, pack_value(value)])
+        finally:
+            self._lock.release()
     
-    def paintEvent(self, event):
+    def append(self, key, pair):
     
-        painter = QPainter()
-        painter.begin(self)
-        painter.fillRect(event.rect(), self.palette().background())
-        
-        if isinstance(self.contents, str) or isinstance(self.contents, unicode):
-            painter.drawText(0, 0, self.width() - 1, self.height() - 1,
-                             Qt.AlignCenter, self.contents)
-        
-        elif isinstance(self.contents, QIcon):
-            mode = {False: QIcon.Disabled, True: QIcon.Normal}[self.isEnabled()]
-            pixmap = self.contents.pixmap(self.width(), self.height(), mode)
-            painter.drawPixmap(0, 0, pixmap)
+        """Appends the pair of integers to the list held for the key, only
+        recording the new pair in the journal. The whole list is written
+        when the file is next rewritten."""
         
-        else:
-            dx = (self.width() - self.contents.width())/2
-            dy = (self.height() - self.contents.height())/2
-            painter.drawImage(dx, dy, self.contents)
-        
-        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
-        painter.end()
+        self._lock.acquire()
+        try:
+            value = self.get(key, [])
+            value.append(pair)
+            self.values[key] = value
+            self._write_record([key, pair, "append"])
+        finally:
+            self._lock.release()
     
-    def sizeHint(self):
+    def _write_record(self, record):
     
-        if isinstance(self.contents, str) or isinstance(self.contents, unicode):
-            fm = QFontMetrics(self.font())
-            size = fm.size(Qt.TextSingleLine, self.contents)
-            l = max(size.width(), size.height())
-            return QSize(l * 1.5, l * 1.5)
-        
-        elif isinstance(self.contents, QIcon):
-            sizes = self.contents.availableSizes()
-            if len(sizes):
-                return self.contents.availableSizes()[0]
-            else:
-                return QSize(0, 0)
+        try:
+            f = open(self.journal_path, "ab")
+            # Start each record on a new line so that an incomplete record
+            # does not spoil the one that follows it.
+            f.write("\n" + self._encoder.encode(record))
+            size = f.tell()
+            f.close()
+        except IOError:
+            return
         
-        else:
-            l = max(self.contents.width(), self.contents.height())
-            return QSize(l, l)
+        if size > self.limit:
+            self.save()
 
-class Label(QLabel):
 
-    clicked = pyqtSignal()
-    pressed = pyqtSignal()
-    released = pyqtSignal()
-    
-    def __init__(self, name, data = None):
-    
-        QLabel.__init__(self, name)
-        
-        self.data = data
-        self._pressed = False
-        self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Preferred)
-        self.setFrameShape(QFrame.Box)
-    
-    def mousePressEvent(self, event):
-    
-        if not self._pressed:
-            self._pressed = True
-            self.pressed.emit()
-    
-    def mouseReleaseEvent(self, event):
-    
-        if self.pressed:
-            self._pressed = False
-            self.clicked.emit()
-            self.released.emit()
-    
-    def sizeHint(self):
-    
-        if not self.text().isEmpty():
-            fm = QFontMetrics(QApplication.font())
-            return fm.size(Qt.TextSingleLine, self.text())
-        else:
-            return QLabel.sizeHint(self)
+# Load the configuration file and set the path so that the PyQt modules can be
+# imported. The file is only read here; write_defaults() writes it. Classes
+# and functions that use Qt are in the buxui module, so that programs that
+# only need the settings do not have to load Qt.
+settings = os.path.abspath(os.path.join(os.getenv("HOME", ""), ".buxpaper"))
 
-class Picture(QWidget):
+# The main settings are only written by write_defaults(), which saves them
+# straight away, so no delay is used. A delay would also start a timer thread
+# and register an exit handler in every program that imports this module.
+config = Config(settings)
+config.load()
 
-    clicked = pyqtSignal(QPoint)
-    pressed = pyqtSignal(QPoint)
-    released = pyqtSignal(QPoint)
-    
-    def __init__(self, image = None, data = None):
-    
-        QWidget.__init__(self)
-        
-        if not image:
-            image = QImage()
-        
-        self.image = image
-        self.data = data
-        self._pressed = False
-        self.setSizePolicy(QSizePolicy.MinimumExpanding,
-                           QSizePolicy.MinimumExpanding)
-    
-    def mousePressEvent(self, event):
-    
-        if not self._pressed:
-            self._pressed = True
-            self.pressed.emit(event.pos())
-    
-    def mouseReleaseEvent(self, event):
-    
-        if self.pressed:
-            self._pressed = False
-            self.clicked.emit(event.pos())
-            self.released.emit(event.pos())
-    
-    def paintEvent(self, event):
-    
-        p = QPainter()
-        p.begin(self)
-        image = self.image.scaled(self.size(), Qt.KeepAspectRatio,
-                                               Qt.SmoothTransformation)
-        x = (self.width() - image.width())/2
-        y = (self.height() - image.height())/2
-        p.drawImage(x, y, image)
-        p.end()
-    
-    def sizeHint(self):
-    
-        return self.image.size()
-    
-    def setImage(self, image):
-    
-        self.image = image
-        self.update()
+path = config.get("PYTHONPATH", "/usr/local/arm-linux-gnueabi/lib/python2.6/site-packages")
+sys.path.append(path)
 
-class PagedWidget(QWidget):
+fbdev = config.get("framebuffer device", "/dev/fb0")
 
-    previousButtonState = pyqtSignal(bool)
-    nextButtonState = pyqtSignal(bool)
-    
-    def __init__(self, parent = None):
-    
-        QWidget.__init__(self, parent)
-        
-        self.padding = 32
-        self.stack = QStackedLayout()
-        self.alignment = Qt.AlignHCenter
-        
-        OuterLayout, InnerLayout = top_layout()
-        
-        if OuterLayout == QHBoxLayout:
-            self.previousButton = PagedWidget.Indicator("left")
-            self.nextButton = PagedWidget.Indicator("right")
-        else:
-            self.previousButton = PagedWidget.Indicator("up")
-            self.nextButton = PagedWidget.Indicator("down")
-        
-        self.previousButton.clicked.connect(self.previousPage)
-        self.nextButton.clicked.connect(self.nextPage)
-        
-        self.updateIndicators()
-        
-        layout = OuterLayout(self)
-        layout.setSpacing(0)
-        layout.addWidget(self.previousButton)
-        layout.addLayout(self.stack, 1)
-        layout.addWidget(self.nextButton)
-        
-        # Add a default page.
-        self.addPage()
-    
-    def addPage(self, layout = None):
-    
-        page = QWidget()
-        
-        if not layout:
-            layout = QVBoxLayout(page)
-        else:
-            page.setLayout(layout)
-        
-        layout.addStretch()
-        
-        self.stack.addWidget(page)
-        self.stack.setCurrentIndex(self.stack.count() - 1)
-        self.updateIndicators()
-        self.space_used = 0
-        
-        return page, layout
-    
-    def previousPage(self):
-    
-        self.stack.setCurrentIndex(self.stack.currentIndex() - 1)
-        self.updateIndicators()
-    
-    def nextPage(self):
-    
-        self.stack.setCurrentIndex(self.stack.currentIndex() + 1)
-        self.updateIndicators()
-    
-    def currentPage(self):
-    
-        return self.stack.currentIndex()
-    
-    def setCurrentPage(self, index):
-    
-        self.stack.setCurrentIndex(index)
-        self.updateIndicators()
-    
-    def pageCount(self):
-    
-        return self.stack.count()
-    
-    def addWidget(self, widget):
-    
-        """Adds a widget to the page, creating a new page for it if there is
-        not enough room for it. It may help to call adjustSize() on the widget
-        before passing it to this method."""
-        
-        page = self.stack.widget(self.stack.count() - 1)
-        layout = page.layout()
-        
-        # If there is not enough space for a spacer and another widget then
-        # create a new page.
-        if page.height() - self.space_used < widget.height() + self.padding:
-            page, layout = self.addPage()
-        
-        last = layout.count() - 1
-        
-        layout.insertSpacing(last, self.padding)
-        layout.insertWidget(last + 1, widget)
-        layout.setAlignment(widget, self.alignment)
-        self.space_used += self.padding + widget.height()
-        
-        if page.height() - self.space_used >= self.padding:
-            layout.insertSpacing(last + 2, self.padding)
-    
-    def updateIndicators(self):
+# Older versions read the touch input setting under a different name from the
+# one they wrote, so accept either.
+touchinput = config.get("touch input device",
+                        config.get("touch input driver", "linuxinput:/dev/input/event1"))
+
+appdir = config.get("applications directory",
+                    os.path.join(os.path.split(settings)[0], "Applications"))
+docdir = config.get("documents directory",
+                    os.path.join(os.path.split(settings)[0], "Documents"))
+picdir = config.get("pictures directory",
+                    os.path.join(os.path.split(settings)[0], "Pictures"))
+drawdir = config.get("drawings directory",
+                     os.path.join(os.path.split(settings)[0], "Drawings"))
+
+thumbnail_size = config.get("thumbnail size", [180, 180])
+
+# Pre-converted frames for the start and sleep screens.
+framedir = os.path.join(picdir, "Frames")
+
+# The number of seconds without input before the display is blanked, or zero
+# to keep the display powered.
+blank_timeout = config.get("display blank timeout", 300)
+
+def write_defaults():
+
+    """Writes the settings in use, including default values for any that are
+    missing, to the configuration file so that they can be edited. Returns
+    True if the file was written."""
     
-        self.previousButton.setEnabled(self.stack.currentIndex() > 0)
-        self.nextButton.setEnabled(self.stack.currentIndex() < self.stack.count() - 1)
-        
-        # Emit signals to interested components.
-        self.previousButtonState.emit(self.stack.currentIndex() > 0)
-        self.nextButtonState.emit(self.stack.currentIndex() < self.stack.count() - 1)
+    config.set("PYTHONPATH", path)
+    config.set("framebuffer device", fbdev)
+    config.set("touch input device", touchinput)
     
-    class Indicator(QWidget):
+    config.set("applications directory", appdir)
+    config.set("documents directory", docdir)
+    config.set("pictures directory", picdir)
+    config.set("drawings directory", drawdir)
     
-        clicked = pyqtSignal()
-        
-        def __init__(self, direction, parent = None):
-        
-            QWidget.__init__(self, parent)
-            
-            self.pressed = False
-            self.direction = direction
-            
-            if direction == "up":
-                self.gradient = QLinearGradient(0, 0, 0, 32)
-                self.path = QPainterPath()
-                self.path.moveTo(32, 0)
-                self.path.lineTo(64, 32)
-                self.path.lineTo(0, 32)
-                self.path.closeSubpath()
-                self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Fixed)
-                self.size_hint = QSize(0, 32)
-            
-            elif direction == "down":
-                self.gradient = QLinearGradient(0, 32, 0, 0)
-                self.path = QPainterPath()
-                self.path.moveTo(32, 32)
-                self.path.lineTo(64, 0)
-                self.path.lineTo(0, 0)
-                self.path.closeSubpath()
-                self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Fixed)
-                self.size_hint = QSize(0, 32)
-            
-            elif direction == "left":
-                self.gradient = QLinearGradient(0, 0, 32, 0)
-                self.path = QPainterPath()
-                self.path.moveTo(0, 32)
-                self.path.lineTo(32, 64)
-                self.path.lineTo(32, 0)
-                self.path.closeSubpath()
-                self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.MinimumExpanding)
-                self.size_hint = QSize(32, 0)
-            
-            elif direction == "right":
-                self.gradient = QLinearGradient(32, 0, 0, 0)
-                self.path = QPainterPath()
-                self.path.moveTo(32, 32)
-                self.path.lineTo(0, 64)
-                self.path.lineTo(0, 0)
-                self.path.closeSubpath()
-                self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.MinimumExpanding)
-                self.size_hint = QSize(32, 0)
-            
-            self.gradient.setColorAt(0, Qt.black)
-            self.gradient.setColorAt(1, Qt.white)
+    config.set("thumbnail size", thumbnail_size)
+    config.set("display blank timeout", blank_timeout)
     
-        def mousePressEvent(self, event):
-        
-            if not self.pressed:
-            
-                self.pressed = True
-                self.clicked.emit()
-        
-        def mouseReleaseEvent(self, event):
-        
-            if self.pressed:
-                self.pressed = False
-        
-        def paintEvent(self, event):
-        
-            painter = QPainter()
-            painter.begin(self)
-            
-            if self.isEnabled():
-            
-                painter.setBrush(self.gradient)
-                painter.setPen(QPen(Qt.NoPen))
-                
-                if self.direction in ("up", "down"):
-                    n = event.rect().x() / 64
-                    r = event.rect().x() % 64
-                    v1 = event.rect().x() - r
-                    v2 = event.rect().right()
-                    dx, dy = 64, 0
-                    painter.translate(v1, 0)
-                else:
-                    n = event.rect().y() / 64
-                    r = event.rect().y() % 64
-                    v1 = event.rect().y() - r
-                    v2 = event.rect().bottom()
-                    dx, dy = 0, 64
-                    painter.translate(0, v1)
-                
-                while v1 < v2:
-                    painter.drawPath(self.path)
-                    painter.translate(dx, dy)
-                    v1 += 64
-            else:
-                painter.fillRect(event.rect(), QColor(200, 200, 200))
-            
-            painter.end()
-        
-        def sizeHint(self):
-        
-            return self.size_hint
+    if not config.dirty:
+        return True
+    return config.save()
 
 # System status
 
@@ -712,6 +415,7 @@ class Power:
         
         return d
 
+
 # Keyboard input
 
 KeyboardExecutable = os.path.join(appdir, "Keyboard", "keyboard.py")
@@ -0,0 +1,953 @@
+"""
+buxui.py - Qt classes and functions shared by the applications.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, sys
+
+# Import buxpaper first so that the path to the PyQt modules is set.
+from buxpaper import blank_timeout, config, fbdev, framedir, pack_value, \
+                     picdir, touchinput
+
+from PyQt4.QtCore import QObject, QPoint, QRect, QSize, QSocketNotifier, \
+                         QTimer, Qt, pyqtSignal
+from PyQt4.QtGui import *
+
+import dither, inotify, linuxfb, mxink, pixelformat
+
+class Application(QApplication):
+
+    def __init__(self, server = False):
+    
+        argv = sys.argv[:]
+        
+        if server and "-qws" not in argv:
+            argv.append("-qws")
+        
+        # Set the touch input driver before starting the application.
+        QWSServer.setDefaultMouse(touchinput)
+        
+        QApplication.__init__(self, argv)
+        
+        # Set the default font to something readable.
+        font_family = config.get("font", "DejaVu Serif")
+        font_size = int(config.get("font size", 24))
+        
+        font = QFont(font_family)
+        font.setPointSize(font_size)
+        self.setFont(font)
+        
+        # Set the default palette to use white as the background colour.
+        palette = QPalette()
+        palette.setColor(QPalette.Window, Qt.white)
+        self.setPalette(palette)
+        
+        # Only the server controls the power of the display, but all
+        # applications track the input so that they know when it is blanked.
+        self.powerManager = PowerManager(control = server)
+    
+    def display_and_quit(self, widget):
+    
+        fb = linuxfb.Framebuffer(fbdev)
+        vi = fb.virtual_screen_info()
+        
+        widget.resize(vi.xres, vi.yres)
+        self.processEvents()
+        
+        # Render the widget straight into the framebuffer memory. QPainter
+        # cannot draw into the indexed image used for greyscale modes, so
+        # render into an RGB image and convert it instead.
+        image = fb.get_image()
+        if image.format() == QImage.Format_Indexed8:
+            rgb = QImage(image.size(), QImage.Format_RGB32)
+            rgb.fill(0xffffffff)
+            p = QPainter()
+            p.begin(rgb)
+            widget.render(p)
+            p.end()
+            
+            g = fb.geometry()
+            data, stride = pixelformat.convert_image(rgb, pixelformat.screen_format(g))
+            fb.blit(data, None, stride)
+        else:
+            p = QPainter()
+            p.begin(image)
+            widget.render(p)
+            p.end()
+        
+        self.quit()
+
+def dither_image(image, levels = 16, method = dither.ORDERED):
+
+    """Returns a greyscale Indexed8 copy of the image, dithered to the given
+    number of grey levels."""
+    
+    if image.format() not in (QImage.Format_RGB16, QImage.Format_RGB32,
+                              QImage.Format_ARGB32, QImage.Format_Indexed8):
+        image = image.convertToFormat(QImage.Format_RGB32)
+    
+    width = image.width()
+    height = image.height()
+    
+    grey, stride = pixelformat.convert_image(image, pixelformat.PixelFormat(8, 1))
+    data = dither.dither(grey, width, height, levels, method)
+    
+    # Copy the image so that it does not refer to the data string.
+    result = QImage(data, width, height, width, QImage.Format_Indexed8).copy()
+    result.setColorTable(map(lambda v: qRgb(v, v, v), range(256)))
+    return result
+
+def fit_image(image, size):
+
+    """Returns the image reduced to fit the given size if necessary and
+    centred on a white background of that size."""
+    
+    # Reduce the image if necessary.
+    if image.width() > size.width() or image.height() > size.height():
+        image = image.scaled(size, Qt.KeepAspectRatio)
+    
+    # Pad the image if necessary.
+    if image.size() != size:
+    
+        # Use a format that keeps any grey levels the image already has.
+        padded = QImage(size, QImage.Format_RGB32)
+        padded.fill(QColor(255, 255, 255))
+        
+        p = QPainter()
+        p.begin(padded)
+        p.drawImage((padded.width() - image.width())/2,
+                    (padded.height() - image.height())/2, image)
+        p.end()
+        
+        image = padded
+    
+    return image
+
+def save_frame(image, path):
+
+    """Saves the image, fitted to the screen, as a frame in the format of the
+    framebuffer that linuxfb.Framebuffer.show_frame() can copy straight to
+    the screen. Returns True if the frame was saved or False if the
+    framebuffer could not be used."""
+    
+    try:
+        g = linuxfb.Framebuffer(fbdev).geometry()
+        format = pixelformat.screen_format(g)
+    except (EnvironmentError, ValueError):
+        return False
+    
+    image = fit_image(image, QSize(g.width, g.height))
+    if image.format() not in (QImage.Format_RGB16, QImage.Format_RGB32,
+                              QImage.Format_ARGB32, QImage.Format_Indexed8):
+        image = image.convertToFormat(QImage.Format_RGB32)
+    
+    data, stride = pixelformat.convert_image(image, format)
+    
+    directory = os.path.split(path)[0]
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    
+    linuxfb.save_frame(path, data, g)
+    return True
+
+def top_layout():
+
+    desktop = QApplication.desktop()
+    geometry = desktop.screenGeometry()
+    
+    if geometry.width() < geometry.height():
+        return QVBoxLayout, QHBoxLayout
+    else:
+        return QHBoxLayout, QVBoxLayout
+
+def layout(n):
+
+    "Returns the appropriate class for the nth layout in a window."
+    return top_layout()[n % 2]
+
+colourScheme = {" ": "\x00\x00\x00\x00",
+                ".": "\x00\x00\x00\xff",
+                "x": "\x80\x80\x80\xff"}
+
+def icon_from_sequence(sequence, palette = colourScheme):
+
+    height = len(sequence)
+    width = len(sequence[0])
+    
+    data = "".join(map(lambda x: colourScheme.get(x, "\x00\x00\x00\x00"), "".join(sequence)))
+    
+    return QIcon(QPixmap.fromImage(QImage(data, width, height, QImage.Format_ARGB32)))
+
+def icon_from_commands(sequence, width, height, palette = colourScheme):
+
+    image = QImage(width, height, QImage.Format_ARGB32)
+    painter = QPainter()
+    painter.begin(image)
+    
+    for command, arguments in sequence:
+    
+        if "pen" not in arguments:
+            arguments["pen"] = QColor(0, 0, 0, 0)
+        if "brush" not in arguments:
+            arguments["brush"] = QColor(0, 0, 0, 0)
+        
+        if command == "fill":
+            painter.fillRect(QRect(0, 0, width, height), QColor(arguments["brush"]))
+        
+        elif command == "polygon":
+            painter.setPen(QColor(arguments["pen"]))
+            painter.setBrush(QColor(arguments["brush"]))
+            painter.drawPolygon(QPolygon(map(lambda (x, y):
+                                         QPoint(x * width, y * height),
+                                         arguments["points"])))
+        
+        elif command == "polyline":
+            painter.setPen(QColor(arguments["pen"]))
+            painter.setBrush(QColor(arguments["brush"]))
+            painter.drawPolyline(QPolygon(map(lambda (x, y):
+                                          QPoint(x * width, y * height),
+                                          arguments["points"])))
+        
+        elif command == "pie":
+            painter.setPen(QColor(arguments["pen"]))
+            painter.setBrush(QColor(arguments["brush"]))
+            painter.drawPie(QRect(arguments["rect"][0] * width,
+                                  arguments["rect"][1] * height,
+                                  arguments["rect"][2] * width,
+                                  arguments["rect"][3] * height),
+                            arguments["start"], arguments["span"])
+    
+    painter.end()
+    
+    return QIcon(QPixmap.fromImage(image))
+
+
+browser_icon = (
+    ("fill", {"brush": "white"}),
+    ("polygon", {"pen": "black", "brush": "#404040",
+                 "points": ((0.2, 0.1), (0.4, 0.1), (0.5, 0.2),
+                            (0.85, 0.2), (0.9, 0.25), (0.9, 0.9),
+                            (0.1, 0.9), (0.1, 0.2))}),
+    ("polygon", {"pen": "black", "brush": "black",
+                 "points": ((0.2, 0.3), (0.9, 0.3))})
+    )
+
+sleep_icon = (
+    ("fill", {"brush": "white"}),
+    ("polygon", {"brush": "black",
+                 "points": ((0.1, 0.5), (0.5, 0.5), (0.5, 0.6), (0.2, 0.8),
+                            (0.5, 0.8), (0.5, 0.9), (0.1, 0.9), (0.1, 0.8),
+                            (0.4, 0.6), (0.1, 0.6))}),
+    ("polygon", {"brush": "#404040",
+                 "points": ((0.5, 0.1), (0.9, 0.1), (0.9, 0.2), (0.6, 0.4),
+                            (0.9, 0.4), (0.9, 0.5), (0.5, 0.5), (0.5, 0.4),
+                            (0.8, 0.2), (0.5, 0.2))})
+    )
+
+class Window(QWidget):
+
+    def __init__(self):
+    
+        QWidget.__init__(self)
+        
+        self.closeButton = Button(u"\u2716")
+        self.closeButton.clicked.connect(self.close)
+        
+        sleepIcon = icon_from_commands(sleep_icon,
+            self.closeButton.sizeHint().width(),
+            self.closeButton.sizeHint().height())
+        
+        self.sleepButton = Button(sleepIcon)
+        self.sleepButton.hide()
+        
+        OuterLayout, InnerLayout = top_layout()
+        layout = OuterLayout(self)
+        self.panel = InnerLayout()
+        
+        self.panel.addWidget(self.closeButton)
+        self.panel.addStretch()
+        self.panel.addWidget(self.sleepButton)
+        self.panel.addStretch()
+        
+        self.contentWidget = QWidget()
+        
+        layout.addLayout(self.panel)
+        layout.addWidget(self.contentWidget, 1)
+    
+    def setSleepImage(self):
+    
+        # The default implementation takes a screenshot of the content widget.
+        self.saveSleepImage(self.grabWidget(self.contentWidget))
+    
+    def grabWidget(self, widget):
+    
+        """Returns an image of the widget as it appears on the screen, read
+        from the framebuffer if possible, or rendered if not."""
+        
+        rect = QRect(widget.mapToGlobal(QPoint(0, 0)), widget.size())
+        
+        try:
+            return linuxfb.Framebuffer(fbdev).grab(rect, image = True)
+        except (EnvironmentError, ValueError):
+            pass
+        
+        image = QImage(widget.size(), QImage.Format_RGB16)
+        widget.render(image)
+        return image
+    
+    def saveSleepImage(self, image):
+    
+        sleep_dir = os.path.join(picdir, "Sleep")
+        
+        # Remove any existing images in the directory.
+        for name in os.listdir(sleep_dir):
+            os.remove(os.path.join(sleep_dir, name))
+        
+        image = fit_image(image, QApplication.desktop().geometry().size())
+        
+        # Reduce the image to the grey levels used by the display, which also
+        # makes the saved file smaller.
+        levels = config.get("sleep image grey levels", 16)
+        if levels:
+            image = dither_image(image, levels,
+                                 config.get("dither method", dither.ORDERED))
+        
+        # Save the image to the directory.
+        image.save(os.path.join(sleep_dir, "saved.png"))
+        
+        # Also save a frame that Tools/splash.py can copy straight to the
+        # screen when the device is suspended.
+        save_frame(image, os.path.join(framedir, "Sleep.raw"))
+
+class Button(QWidget):
+
+    pressed = pyqtSignal()
+    clicked = pyqtSignal()
+    released = pyqtSignal()
+    
+    def __init__(self, contents, parent = None):
+    
+        QWidget.__init__(self, parent)
+        
+        self.contents = contents
+        self._pressed = False
+        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        
+        font = QFont(QApplication.font())
+        font.setPointSize(font.pointSize() * 1.5)
+        self.setFont(font)
+    
+    def mousePressEvent(self, event):
+    
+        if not self._pressed:
+            self._pressed = True
+            self.pressed.emit()
+    
+    def mouseReleaseEvent(self, event):
+    
+        if self._pressed:
+            self._pressed = False
+            self.clicked.emit()
+            self.released.emit()
+    
+    def paintEvent(self, event):
+    
+        painter = QPainter()
+        painter.begin(self)
+        painter.fillRect(event.rect(), self.palette().background())
+        
+        if isinstance(self.contents, str) or isinstance(self.contents, unicode):
+            painter.drawText(0, 0, self.width() - 1, self.height() - 1,
+                             Qt.AlignCenter, self.contents)
+        
+        elif isinstance(self.contents, QIcon):
+            mode = {False: QIcon.Disabled, True: QIcon.Normal}[self.isEnabled()]
+            pixmap = self.contents.pixmap(self.width(), self.height(), mode)
+            painter.drawPixmap(0, 0, pixmap)
+        
+        else:
+            dx = (self.width() - self.contents.width())/2
+            dy = (self.height() - self.contents.height())/2
+            painter.drawImage(dx, dy, self.contents)
+        
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.end()
+    
+    def sizeHint(self):
+    
+        if isinstance(self.contents, str) or isinstance(self.contents, unicode):
+            fm = QFontMetrics(self.font())
+            size = fm.size(Qt.TextSingleLine, self.contents)
+            l = max(size.width(), size.height())
+            return QSize(l * 1.5, l * 1.5)
+        
+        elif isinstance(self.contents, QIcon):
+            sizes = self.contents.availableSizes()
+            if len(sizes):
+                return self.contents.availableSizes()[0]
+            else:
+                return QSize(0, 0)
+        
+        else:
+            l = max(self.contents.width(), self.contents.height())
+            return QSize(l, l)
+
+class Label(QLabel):
+
+    clicked = pyqtSignal()
+    pressed = pyqtSignal()
+    released = pyqtSignal()
+    
+    def __init__(self, name, data = None):
+    
+        QLabel.__init__(self, name)
+        
+        self.data = data
+        self._pressed = False
+        self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Preferred)
+        self.setFrameShape(QFrame.Box)
+    
+    def mousePressEvent(self, event):
+    
+        if not self._pressed:
+            self._pressed = True
+            self.pressed.emit()
+    
+    def mouseReleaseEvent(self, event):
+    
+        if self.pressed:
+            self._pressed = False
+            self.clicked.emit()
+            self.released.emit()
+    
+    def sizeHint(self):
+    
+        if not self.text().isEmpty():
+            fm = QFontMetrics(QApplication.font())
+            return fm.size(Qt.TextSingleLine, self.text())
+        else:
+            return QLabel.sizeHint(self)
+
+class Picture(QWidget):
+
+    clicked = pyqtSignal(QPoint)
+    pressed = pyqtSignal(QPoint)
+    released = pyqtSignal(QPoint)
+    
+    def __init__(self, image = None, data = None):
+    
+        QWidget.__init__(self)
+        
+        if not image:
+            image = QImage()
+        
+        self.image = image
+        self.data = data
+        self._pressed = False
+        self.setSizePolicy(QSizePolicy.MinimumExpanding,
+                           QSizePolicy.MinimumExpanding)
+    
+    def mousePressEvent(self, event):
+    
+        if not self._pressed:
+            self._pressed = True
+            self.pressed.emit(event.pos())
+    
+    def mouseReleaseEvent(self, event):
+    
+        if self.pressed:
+            self._pressed = False
+            self.clicked.emit(event.pos())
+            self.released.emit(event.pos())
+    
+    def paintEvent(self, event):
+    
+        p = QPainter()
+        p.begin(self)
+        image = self.image.scaled(self.size(), Qt.KeepAspectRatio,
+                                               Qt.SmoothTransformation)
+        x = (self.width() - image.width())/2
+        y = (self.height() - image.height())/2
+        p.drawImage(x, y, image)
+        p.end()
+    
+    def sizeHint(self):
+    
+        return self.image.size()
+    
+    def setImage(self, image):
+    
+        self.image = image
+        self.update()
+
+class PagedWidget(QWidget):
+
+    previousButtonState = pyqtSignal(bool)
+    nextButtonState = pyqtSignal(bool)
+    
+    def __init__(self, parent = None):
+    
+        QWidget.__init__(self, parent)
+        
+        self.padding = 32
+        self.stack = QStackedLayout()
+        self.alignment = Qt.AlignHCenter
+        
+        OuterLayout, InnerLayout = top_layout()
+        
+        if OuterLayout == QHBoxLayout:
+            self.previousButton = PagedWidget.Indicator("left")
+            self.nextButton = PagedWidget.Indicator("right")
+        else:
+            self.previousButton = PagedWidget.Indicator("up")
+            self.nextButton = PagedWidget.Indicator("down")
+        
+        self.previousButton.clicked.connect(self.previousPage)
+        self.nextButton.clicked.connect(self.nextPage)
+        
+        self.updateIndicators()
+        
+        layout = OuterLayout(self)
+        layout.setSpacing(0)
+        layout.addWidget(self.previousButton)
+        layout.addLayout(self.stack, 1)
+        layout.addWidget(self.nextButton)
+        
+        # Add a default page.
+        self.addPage()
+    
+    def addPage(self, layout = None):
+    
+        page = QWidget()
+        
+        if not layout:
+            layout = QVBoxLayout(page)
+        else:
+            page.setLayout(layout)
+        
+        layout.addStretch()
+        
+        self.stack.addWidget(page)
+        self.stack.setCurrentIndex(self.stack.count() - 1)
+        self.updateIndicators()
+        self.space_used = 0
+        
+        return page, layout
+    
+    def previousPage(self):
+    
+        self.stack.setCurrentIndex(self.stack.currentIndex() - 1)
+        self.updateIndicators()
+    
+    def nextPage(self):
+    
+        self.stack.setCurrentIndex(self.stack.currentIndex() + 1)
+        self.updateIndicators()
+    
+    def currentPage(self):
+    
+        return self.stack.currentIndex()
+    
+    def setCurrentPage(self, index):
+    
+        self.stack.setCurrentIndex(index)
+        self.updateIndicators()
+    
+    def pageCount(self):
+    
+        return self.stack.count()
+    
+    def addWidget(self, widget):
+    
+        """Adds a widget to the page, creating a new page for it if there is
+        not enough room for it. It may help to call adjustSize() on the widget
+        before passing it to this method."""
+        
+        page = self.stack.widget(self.stack.count() - 1)
+        layout = page.layout()
+        
+        # If there is not enough space for a spacer and another widget then
+        # create a new page.
+        if page.height() - self.space_used < widget.height() + self.padding:
+            page, layout = self.addPage()
+        
+        last = layout.count() - 1
+        
+        layout.insertSpacing(last, self.padding)
+        layout.insertWidget(last + 1, widget)
+        layout.setAlignment(widget, self.alignment)
+        self.space_used += self.padding + widget.height()
+        
+        if page.height() - self.space_used >= self.padding:
+            layout.insertSpacing(last + 2, self.padding)
+    
+    def updateIndicators(self):
+    
+        self.previousButton.setEnabled(self.stack.currentIndex() > 0)
+        self.nextButton.setEnabled(self.stack.currentIndex() < self.stack.count() - 1)
+        
+        # Emit signals to interested components.
+        self.previousButtonState.emit(self.stack.currentIndex() > 0)
+        self.nextButtonState.emit(self.stack.currentIndex() < self.stack.count() - 1)
+    
+    class Indicator(QWidget):
+    
+        clicked = pyqtSignal()
+        
+        def __init__(self, direction, parent = None):
+        
+            QWidget.__init__(self, parent)
+            
+            self.pressed = False
+            self.direction = direction
+            
+            if direction == "up":
+                self.gradient = QLinearGradient(0, 0, 0, 32)
+                self.path = QPainterPath()
+                self.path.moveTo(32, 0)
+                self.path.lineTo(64, 32)
+                self.path.lineTo(0, 32)
+                self.path.closeSubpath()
+                self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Fixed)
+                self.size_hint = QSize(0, 32)
+            
+            elif direction == "down":
+                self.gradient = QLinearGradient(0, 32, 0, 0)
+                self.path = QPainterPath()
+                self.path.moveTo(32, 32)
+                self.path.lineTo(64, 0)
+                self.path.lineTo(0, 0)
+                self.path.closeSubpath()
+                self.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Fixed)
+                self.size_hint = QSize(0, 32)
+            
+            elif direction == "left":
+                self.gradient = QLinearGradient(0, 0, 32, 0)
+                self.path = QPainterPath()
+                self.path.moveTo(0, 32)
+                self.path.lineTo(32, 64)
+                self.path.lineTo(32, 0)
+                self.path.closeSubpath()
+                self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.MinimumExpanding)
+                self.size_hint = QSize(32, 0)
+            
+            elif direction == "right":
+                self.gradient = QLinearGradient(32, 0, 0, 0)
+                self.path = QPainterPath()
+                self.path.moveTo(32, 32)
+                self.path.lineTo(0, 64)
+                self.path.lineTo(0, 0)
+                self.path.closeSubpath()
+                self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.MinimumExpanding)
+                self.size_hint = QSize(32, 0)
+            
+            self.gradient.setColorAt(0, Qt.black)
+            self.gradient.setColorAt(1, Qt.white)
+        
+        def mousePressEvent(self, event):
+        
+            if not self.pressed:
+            
+                self.pressed = True
+                self.clicked.emit()
+        
+        def mouseReleaseEvent(self, event):
+        
+            if self.pressed:
+                self.pressed = False
+        
+        def paintEvent(self, event):
+        
+            painter = QPainter()
+            painter.begin(self)
+            
+            if self.isEnabled():
+            
+                painter.setBrush(self.gradient)
+                painter.setPen(QPen(Qt.NoPen))
+                
+                if self.direction in ("up", "down"):
+                    n = event.rect().x() / 64
+                    r = event.rect().x() % 64
+                    v1 = event.rect().x() - r
+                    v2 = event.rect().right()
+                    dx, dy = 64, 0
+                    painter.translate(v1, 0)
+                else:
+                    n = event.rect().y() / 64
+                    r = event.rect().y() % 64
+                    v1 = event.rect().y() - r
+                    v2 = event.rect().bottom()
+                    dx, dy = 0, 64
+                    painter.translate(0, v1)
+                
+                while v1 < v2:
+                    painter.drawPath(self.path)
+                    painter.translate(dx, dy)
+                    v1 += 64
+            else:
+                painter.fillRect(event.rect(), QColor(200, 200, 200))
+            
+            painter.end()
+        
+        def sizeHint(self):
+        
+            return self.size_hint
+
+
+class PowerManager(QObject):
+
+    """Tracks input from the touch device and emits blanked(True) when there
+    has been none for the given number of seconds, and blanked(False) on the
+    next touch. If control is True, the display is also blanked and unblanked
+    using the framebuffer device."""
+    
+    blanked = pyqtSignal(bool)
+    
+    def __init__(self, timeout = None, control = False, device = None,
+                       parent = None):
+    
+        QObject.__init__(self, parent)
+        
+        if timeout is None:
+            timeout = blank_timeout
+        if device is None:
+            # Use the device named in the touch input driver specification.
+            device = filter(lambda s: s.startswith("/"), touchinput.split(":"))
+            device = device and device[0] or None
+        
+        self.control = control
+        self.isBlanked = False
+        self.notifier = None
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(timeout * 1000))
+        self.timer.timeout.connect(self.blank)
+        
+        if not timeout or not device:
+            return
+        
+        try:
+            self.input = os.open(device, os.O_RDONLY | os.O_NONBLOCK)
+        except OSError:
+            # Without input, the display could never be unblanked.
+            return
+        
+        self.notifier = QSocketNotifier(self.input, QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.readInput)
+        self.timer.start()
+    
+    def readInput(self):
+    
+        # The events themselves are not needed, only the fact that they
+        # occurred.
+        try:
+            while os.read(self.input, 1024):
+                pass
+        except OSError:
+            pass
+        
+        if self.isBlanked:
+            self.unblank()
+        
+        self.timer.start()
+    
+    def blank(self):
+    
+        if self.isBlanked:
+            return
+        
+        if self.control:
+            try:
+                linuxfb.Framebuffer(fbdev).blank()
+            except EnvironmentError:
+                pass
+        
+        self.isBlanked = True
+        self.blanked.emit(True)
+    
+    def unblank(self):
+    
+        if not self.isBlanked:
+            return
+        
+        if self.control:
+            try:
+                linuxfb.Framebuffer(fbdev).unblank()
+            except EnvironmentError:
+                pass
+        
+        self.isBlanked = False
+        self.blanked.emit(False)
+
+
+def power_manager():
+
+    """Returns the power manager of the running application, or None if there
+    is no application."""
+    
+    app = QApplication.instance()
+    return getattr(app, "powerManager", None)
+
+
+class DisplayUpdater(QObject):
+
+    """Sends updates of areas of the screen to the e-ink display controller
+    after they have been painted, using a RefreshScheduler with the given
+    policy to decide when a full refresh is needed to clear ghosting. After
+    partial updates, the scheduler is also asked for a refresh once the
+    screen has been idle for idle_time seconds. Updates are ignored if the
+    display controller is not available."""
+    
+    def __init__(self, policy = None, mode = mxink.GREYSCALE, idle_time = 10,
+                       parent = None):
+    
+        QObject.__init__(self, parent)
+        
+        self.mode = mode
+        self.controller = None
+        
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.timeout.connect(self.flush)
+        
+        self.idleTimer = QTimer(self)
+        self.idleTimer.setSingleShot(True)
+        self.idleTimer.setInterval(int(idle_time * 1000))
+        self.idleTimer.timeout.connect(self.idle)
+        
+        try:
+            fb = linuxfb.Framebuffer(fbdev)
+            g = fb.geometry()
+        except EnvironmentError:
+            return
+        
+        self.scheduler = mxink.RefreshScheduler(g.width, g.height,
+                                                idle_time = idle_time,
+                                                policy = policy)
+        self.controller = mxink.Controller(fb, scheduler = self.scheduler)
+    
+    def update(self, widget, rect, mode = None):
+    
+        """Queues an update of the rect of the widget, which is sent when
+        control returns to the event loop so that the painting has reached
+        the framebuffer."""
+        
+        if not self.controller:
+            return
+        
+        if mode is None:
+            mode = self.mode
+        
+        pos = widget.mapToGlobal(rect.topLeft())
+        self.controller.add((pos.x(), pos.y(), rect.width(), rect.height()), mode)
+        self.flushTimer.start(0)
+    
+    def flush(self):
+    
+        QApplication.flush()
+        
+        try:
+            self.controller.flush()
+        except EnvironmentError:
+            # The display does not accept the update requests, so stop
+            # making them.
+            self.controller = None
+            return
+        
+        self.idleTimer.start()
+    
+    def idle(self):
+    
+        if not self.controller:
+            return
+        
+        try:
+            refreshed = self.controller.idle()
+        except EnvironmentError:
+            self.controller = None
+            return
+        
+        # Try again later if the policy deferred the refresh or the screen
+        # has not been idle for long enough since the last update.
+        if not refreshed and self.scheduler.ghosting():
+            self.idleTimer.start()
+
+
+class ConfigWatcher(QObject):
+
+    """Reloads a buxpaper.Config when its file is changed by another process,
+    emitting changed(key, value) for each setting whose value is different.
+    The value is None if the setting was removed. Settings are not reloaded
+    while the config has changes of its own that have not been saved."""
+    
+    changed = pyqtSignal(object, object)
+    
+    def __init__(self, config, parent = None):
+    
+        QObject.__init__(self, parent)
+        
+        self.config = config
+        self.notifier = None
+        
+        # Files are replaced rather than rewritten, so watch the directory
+        # containing them.
+        directory, name = os.path.split(config.path)
+        self.names = set([name])
+        journal_path = getattr(config, "journal_path", None)
+        if journal_path:
+            self.names.add(os.path.split(journal_path)[1])
+        
+        try:
+            self.watcher = inotify.Watcher()
+            self.watcher.add(directory, inotify.IN_CLOSE_WRITE |
+                                        inotify.IN_MOVED_TO | inotify.IN_DELETE)
+        except (OSError, AttributeError):
+            # Without inotify support the settings are simply not reloaded.
+            return
+        
+        self.notifier = QSocketNotifier(self.watcher.fileno(),
+                                        QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self.readEvents)
+    
+    def readEvents(self):
+    
+        names = map(lambda event: event[3], self.watcher.read())
+        if self.names.intersection(names):
+            self.reload()
+    
+    def reload(self):
+    
+        self.config._lock.acquire()
+        try:
+            if self.config.dirty:
+                return
+            
+            old = self.config.values.copy()
+            self.config.load()
+            new = self.config.values
+        finally:
+            self.config._lock.release()
+        
+        # Compare the packed forms of the values, since either may have been
+        # unpacked by Config.get().
+        for key in sorted(set(old) | set(new)):
+            if key not in new:
+                self.changed.emit(key, None)
+            elif key not in old or pack_value(old[key]) != pack_value(new[key]):
+                self.changed.emit(key, self.config.get(key, None))
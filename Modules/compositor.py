@@ -0,0 +1,240 @@
+"""
+compositor.py - Composition of cached surfaces into the Linux framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pixelformat
+from linuxfb import _contains, _intersect
+
+class Surface:
+
+    """Holds the pixels of a rectangular area of the screen in the format of
+    the framebuffer, as a list of strings with one for each row. Changes to
+    the surface are recorded as damaged rects, in surface coordinates, until
+    a Compositor copies them to the screen. Surfaces with higher z values are
+    placed above those with lower values."""
+    
+    def __init__(self, x, y, width, height, format, z = 0):
+    
+        if format.bits_per_pixel % 8 != 0:
+            raise ValueError("Surfaces need whole bytes for each pixel.")
+        
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.format = format
+        self.z = z
+        self.visible = True
+        
+        self._bpp = format.bits_per_pixel / 8
+        self.rows = ["\x00" * (width * self._bpp)] * height
+        self.damage = [(0, 0, width, height)]
+    
+    def rect(self):
+    
+        return (self.x, self.y, self.width, self.height)
+    
+    def update(self, data, stride, rect = None):
+    
+        """Replaces the pixels in the rect, given as (x, y, width, height) in
+        surface coordinates, with the string of data in the surface format
+        that uses the given stride. The whole surface is replaced if rect is
+        omitted."""
+        
+        if rect is None:
+            rect = (0, 0, self.width, self.height)
+        
+        x, y, w, h = rect = self._clip(rect)
+        if w <= 0 or h <= 0:
+            return
+        
+        start = x * self._bpp
+        end = start + (w * self._bpp)
+        
+        for row in xrange(h):
+            src = row * stride
+            line = self.rows[y + row]
+            self.rows[y + row] = line[:start] + data[src:src + end - start] + line[end:]
+        
+        self.add_damage(rect)
+    
+    def add_damage(self, rect):
+    
+        # Discard damaged rects that are inside the new one, and the new one
+        # if it is inside an existing rect.
+        for other in self.damage:
+            if _contains(other, rect):
+                return
+        
+        self.damage = filter(lambda other: not _contains(rect, other), self.damage)
+        self.damage.append(rect)
+    
+    def update_image(self, image, x = 0, y = 0):
+    
+        """Draws a QImage at (x, y) in surface coordinates, converting it to
+        the surface format."""
+        
+        data, stride = pixelformat.convert_image(image, self.format)
+        self.update(data, stride, (x, y, image.width(), image.height()))
+    
+    def fill(self, colour, rect = None):
+    
+        """Fills the rect with a colour, given as a string containing one
+        pixel in the surface format."""
+        
+        if rect is None:
+            rect = (0, 0, self.width, self.height)
+        
+        x, y, w, h = self._clip(rect)
+        if w > 0 and h > 0:
+            self.update(colour * (w * h), w * self._bpp, (x, y, w, h))
+    
+    def _clip(self, rect):
+    
+        x, y, w, h = rect
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(x + w, self.width)
+        y2 = min(y + h, self.height)
+        return (x1, y1, x2 - x1, y2 - y1)
+
+
+class Compositor:
+
+    """Copies the damaged parts of a set of surfaces to a linuxfb.Framebuffer.
+    Parts of a surface that are covered by visible surfaces above it are not
+    copied. If an mxink.Controller is given, the updated areas are added to
+    it with the given mode after each composition."""
+    
+    def __init__(self, fb, controller = None, mode = None):
+    
+        self.fb = fb
+        self.controller = controller
+        self.mode = mode
+        self.surfaces = []
+    
+    def add(self, surface):
+    
+        self.surfaces.append(surface)
+        self.surfaces.sort(key = lambda s: s.z)
+        surface.damage = [(0, 0, surface.width, surface.height)]
+    
+    def remove(self, surface):
+    
+        """Removes the surface, exposing whatever lies beneath it."""
+        
+        self.surfaces.remove(surface)
+        for other in self.surfaces:
+            other.add_damage(_to_surface(other, surface.rect()))
+    
+    def move(self, surface, x, y):
+    
+        """Moves the surface to (x, y), exposing the area it covered."""
+        
+        exposed = surface.rect()
+        surface.x = x
+        surface.y = y
+        
+        for other in self.surfaces:
+            other.add_damage(_to_surface(other, exposed))
+        surface.add_damage((0, 0, surface.width, surface.height))
+    
+    def compose(self):
+    
+        """Copies the damaged areas of all surfaces to the screen and returns
+        a list of the (x, y, width, height) rects that were updated."""
+        
+        b = self.fb.get_buffer()
+        g = self.fb.geometry()
+        page = self.fb.drawing_page()
+        screen = (0, 0, g.width, g.height)
+        updated = []
+        
+        for i, surface in enumerate(self.surfaces):
+        
+            damage = surface.damage
+            surface.damage = []
+            
+            if not surface.visible:
+                continue
+            
+            above = map(lambda s: s.rect(),
+                        filter(lambda s: s.visible, self.surfaces[i + 1:]))
+            
+            for rect in damage:
+            
+                x, y, w, h = surface._clip(rect)
+                rect = _intersect((x + surface.x, y + surface.y, w, h), screen)
+                if not rect:
+                    continue
+                
+                # Only copy the parts that are not hidden by other surfaces.
+                parts = [rect]
+                for cover in above:
+                    parts = reduce(lambda l, r: l + _subtract(r, cover), parts, [])
+                
+                for x, y, w, h in parts:
+                
+                    start = (x - surface.x) * surface._bpp
+                    length = w * surface._bpp
+                    
+                    for row in xrange(y, y + h):
+                        line = surface.rows[row - surface.y]
+                        dest = g.offset(x, row, page)
+                        b[dest:dest + length] = line[start:start + length]
+                    
+                    updated.append((x, y, w, h))
+        
+        if self.controller and updated:
+            for rect in updated:
+                if self.mode is None:
+                    self.controller.add(rect)
+                else:
+                    self.controller.add(rect, self.mode)
+            self.controller.flush()
+        
+        return updated
+
+
+def _to_surface(surface, rect):
+
+    return (rect[0] - surface.x, rect[1] - surface.y, rect[2], rect[3])
+
+def _subtract(rect, cover):
+
+    """Returns a list of up to four rects that cover the parts of rect that
+    are not covered by the cover rect."""
+    
+    overlap = _intersect(rect, cover)
+    if not overlap:
+        return [rect]
+    
+    x, y, w, h = rect
+    ox, oy, ow, oh = overlap
+    parts = []
+    
+    if oy > y:
+        parts.append((x, y, w, oy - y))
+    if oy + oh < y + h:
+        parts.append((x, oy + oh, w, y + h - oy - oh))
+    if ox > x:
+        parts.append((x, oy, ox - x, oh))
+    if ox + ow < x + w:
+        parts.append((ox + ow, oy, x + w - ox - ow, oh))
+    
+    return parts
@@ -0,0 +1,150 @@
+"""
+dither.py - Dithering of greyscale images to the grey levels of a display.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ORDERED = "ordered"
+FLOYD_STEINBERG = "Floyd-Steinberg"
+
+# The 8x8 Bayer threshold matrix.
+bayer = (
+    ( 0, 32,  8, 40,  2, 34, 10, 42),
+    (48, 16, 56, 24, 50, 18, 58, 26),
+    (12, 44,  4, 36, 14, 46,  6, 38),
+    (60, 28, 52, 20, 62, 30, 54, 22),
+    ( 3, 35, 11, 43,  1, 33,  9, 41),
+    (51, 19, 59, 27, 49, 17, 57, 25),
+    (15, 47,  7, 39, 13, 45,  5, 37),
+    (63, 31, 55, 23, 61, 29, 53, 21)
+    )
+
+def grey_levels(levels):
+
+    """Returns the 8-bit grey values used for the given number of levels."""
+    
+    return [(i * 255) / (levels - 1) for i in range(levels)]
+
+def ordered(data, width, height, levels = 16):
+
+    """Reduces the 8-bit grey data of the given width and height to the given
+    number of evenly spaced grey levels using Bayer ordered dithering. Returns
+    a string of 8-bit grey values."""
+    
+    steps = levels - 1
+    
+    if numpy:
+        pixels = numpy.frombuffer(data, numpy.uint8, width * height)
+        pixels = pixels.reshape(height, width).astype(numpy.int32)
+        
+        matrix = numpy.array(bayer, numpy.int32)
+        thresholds = numpy.tile(matrix, ((height + 7) / 8, (width + 7) / 8))
+        thresholds = thresholds[:height, :width]
+        
+        # Scale each value to the range of levels, in 64ths, and add the
+        # threshold before truncating to a level.
+        level = (pixels * steps * 64 / 255 + thresholds) / 64
+        level = numpy.minimum(level, steps)
+        return ((level * 255) / steps).astype(numpy.uint8).tostring()
+    
+    # Precompute the output value for each input value and threshold.
+    tables = []
+    for t in range(64):
+        table = []
+        for v in range(256):
+            level = min((v * steps * 64 / 255 + t) / 64, steps)
+            table.append(chr((level * 255) / steps))
+        tables.append("".join(table))
+    
+    rows = []
+    for y in range(height):
+    
+        row = data[y * width:(y + 1) * width]
+        out = array.array("B", row)
+        thresholds = bayer[y % 8]
+        
+        # Dither every eighth pixel of the row with the same threshold.
+        for i in range(8):
+            out[i::8] = array.array("B", row[i::8].translate(tables[thresholds[i]]))
+        
+        rows.append(out.tostring())
+    
+    return "".join(rows)
+
+def floyd_steinberg(data, width, height, levels = 16):
+
+    """Reduces the 8-bit grey data of the given width and height to the given
+    number of evenly spaced grey levels using Floyd-Steinberg error diffusion.
+    Returns a string of 8-bit grey values."""
+    
+    steps = levels - 1
+    quantise = [(((v * steps + 127) / 255) * 255) / steps for v in range(256)]
+    
+    # Errors are carried to the next row in a list with a spare entry at
+    # each end, so that the edges need no special treatment.
+    below = [0] * (width + 2)
+    rows = []
+    
+    for y in range(height):
+    
+        row = array.array("B", data[y * width:(y + 1) * width]).tolist()
+        current = below
+        below = [0] * (width + 2)
+        
+        if y % 2 == 0:
+            columns = xrange(width)
+            direction = 1
+        else:
+            # Serpentine scanning avoids drifting patterns.
+            columns = xrange(width - 1, -1, -1)
+            direction = -1
+        
+        carry = 0
+        
+        for x in columns:
+        
+            value = row[x] + (current[x + 1] + carry) / 16
+            if value < 0:
+                value = 0
+            elif value > 255:
+                value = 255
+            
+            new = quantise[value]
+            row[x] = new
+            error = value - new
+            
+            carry = error * 7
+            below[x + 1 - direction] += error * 3
+            below[x + 1] += error * 5
+            below[x + 1 + direction] += error
+        
+        rows.append(array.array("B", row).tostring())
+    
+    return "".join(rows)
+
+def dither(data, width, height, levels = 16, method = ORDERED):
+
+    if method == FLOYD_STEINBERG:
+        return floyd_steinberg(data, width, height, levels)
+    else:
+        return ordered(data, width, height, levels)
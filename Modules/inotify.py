@@ -0,0 +1,128 @@
+"""
+inotify.py - Notification of changes to files using the Linux inotify API.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ctypes, ctypes.util, errno, os, struct
+
+# See include/uapi/linux/inotify.h in the kernel sources for the origin of
+# these values.
+IN_MODIFY       = 0x00000002
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_FROM   = 0x00000040
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_DELETE       = 0x00000200
+IN_DELETE_SELF  = 0x00000400
+IN_IGNORED      = 0x00008000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC  = 0x00080000
+
+# struct inotify_event: the watch descriptor, event mask, cookie and the
+# length of the name that follows.
+_event = struct.Struct("iIII")
+
+_libc = None
+
+def _get_libc():
+
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                            use_errno = True)
+    return _libc
+
+def _check(result):
+
+    if result < 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+    return result
+
+class Watcher:
+
+    """Watches files and directories for changes. The watcher's file
+    descriptor becomes readable when events are available, so it can be used
+    with select() or a QSocketNotifier."""
+    
+    def __init__(self):
+    
+        self._libc = _get_libc()
+        self.fd = _check(self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self.paths = {}
+    
+    def fileno(self):
+    
+        return self.fd
+    
+    def add(self, path, mask = IN_CLOSE_WRITE | IN_MOVED_TO):
+    
+        """Watches the file or directory at the path for the events in the
+        mask, returning the watch descriptor."""
+        
+        wd = _check(self._libc.inotify_add_watch(self.fd, path, mask))
+        self.paths[wd] = path
+        return wd
+    
+    def remove(self, wd):
+    
+        _check(self._libc.inotify_rm_watch(self.fd, wd))
+        del self.paths[wd]
+    
+    def read(self):
+    
+        """Returns a list of (path, mask, cookie, name) tuples for the events
+        that are waiting, where the path is the watched path and the name is
+        that of the file in a watched directory that the event refers to."""
+        
+        events = []
+        
+        while True:
+        
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError, exception:
+                if exception.errno == errno.EAGAIN:
+                    break
+                raise
+            
+            if not data:
+                break
+            
+            offset = 0
+            while offset < len(data):
+            
+                wd, mask, cookie, length = _event.unpack_from(data, offset)
+                offset += _event.size
+                name = data[offset:offset + length].rstrip("\x00")
+                offset += length
+                
+                path = self.paths.get(wd)
+                if mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                
+                events.append((path, mask, cookie, name))
+        
+        return events
+    
+    def close(self):
+    
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.paths = {}
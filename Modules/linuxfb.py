@@ -17,12 +17,13 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import array, fcntl, mmap, struct
+import array, ctypes, errno, fcntl, mmap, os, struct, tempfile, threading, time, zlib
 
 # See /usr/include/linux/fb.h for the origin of these values:
 FBIOGET_VSCREENINFO = 0x4600
 FBIOPUT_VSCREENINFO = 0x4601
 FBIOGET_FSCREENINFO = 0x4602
+FBIOPAN_DISPLAY     = 0x4606
 
 FBIOBLANK = 0x4611
 VESA_NO_BLANKING   = 0
@@ -43,35 +44,104 @@ FB_VISUAL_PSEUDOCOLOR        = 3
 FB_VISUAL_DIRECTCOLOR        = 4
 FB_VISUAL_STATIC_PSEUDOCOLOR = 5
 
-class ScreenInfo:
+FB_ROTATE_UR  = 0
+FB_ROTATE_CW  = 1
+FB_ROTATE_UD  = 2
+FB_ROTATE_CCW = 3
 
-    def __init__(self, device):
+def ioctl(device, request, arg, mutate = True):
+
+    """Performs the request on the device, passing it to the device's own
+    ioctl() method if it has one, as a simulated device does."""
     
-        self._device = device
+    if hasattr(device, "ioctl"):
+        return device.ioctl(request, arg, mutate)
+    else:
+        return fcntl.ioctl(device, request, arg, mutate)
+
+class Layout:
+
+    """Describes the layout of a screen information structure using a single
+    precompiled struct.Struct, with fields aligned as in the C structure.
+    Decoded structures are flat lists of values in which each named field
+    occupies one or more consecutive entries."""
+    
+    def __init__(self, definitions):
+    
+        self.names = tuple(map(lambda (name, format): name, definitions))
+        self.struct = struct.Struct("".join(map(lambda (name, format): format,
+                                                definitions)))
+        self.size = self.struct.size
         
-        self._array_map = {}
+        self.fields = {}
         i = 0
-        for name, format in self._definitions:
-            self._array_map[name] = (i, format)
-            i += struct.calcsize(format)
+        for name, format in definitions:
+            count = len(struct.unpack(format, "\x00" * struct.calcsize(format)))
+            self.fields[name] = (i, count)
+            i += count
         
-        self._struct_length = i
+        self._defaults = list(self.struct.unpack("\x00" * self.size))
+    
+    def value(self, values, name):
+    
+        index, count = self.fields[name]
+        if count == 1:
+            return values[index]
+        else:
+            return tuple(values[index:index + count])
+    
+    def set_value(self, values, name, value):
+    
+        index, count = self.fields[name]
+        if count == 1:
+            values[index] = value
+        else:
+            values[index:index + count] = list(value)
+    
+    def pack(self, values):
+    
+        return self.struct.pack(*values)
+    
+    def unpack(self, data):
+    
+        return list(self.struct.unpack(data))
+    
+    def pack_fields(self, **fields):
+    
+        """Packs a structure containing the given field values, with all other
+        fields set to zero."""
         
+        values = self._defaults[:]
+        for name, value in fields.items():
+            self.set_value(values, name, value)
+        return self.pack(values)
+    
+    def unpack_fields(self, data):
+    
+        values = self.unpack(data)
+        fields = {}
+        for name in self.names:
+            fields[name] = self.value(values, name)
+        return fields
+
+
+class ScreenInfo:
+
+    """Holds a copy of one of the screen information structures of a device.
+    The structure is decoded once when it is read, so fields can be read and
+    changed cheaply, and is encoded again when put_info() is called."""
+    
+    def __init__(self, device):
+    
+        self._device = device
         self.get_info()
     
     def __getattr__(self, name):
     
         try:
-            index, format = self._array_map[name]
+            return self._layout.value(self._values, name)
         except KeyError:
-            raise AttributeError
-        
-        bytes = struct.calcsize(format)
-        value = struct.unpack(format, self._array[index:index + bytes])
-        if len(value) == 1:
-            return value[0]
-        else:
-            return value
+            raise AttributeError(name)
     
     def __setattr__(self, name, value):
     
@@ -80,29 +150,33 @@ class ScreenInfo:
             return
         
         try:
-            index, format = self._array_map[name]
+            self._layout.set_value(self._values, name, value)
         except KeyError:
-            raise AttributeError
-        
-        if type(value) != tuple:
-            value = (value,)
-        
-        data = array.array("c", struct.pack(format, *value))
-        self._array[index:index + len(data)] = data
+            raise AttributeError(name)
     
     def get_info(self):
     
-        self._array = array.array("c", ["\x00"]*self._struct_length)
+        data = array.array("c", "\x00" * self._layout.size)
         # Obtain data about the device in the array (mutable = 1).
-        fcntl.ioctl(self._device, self._get, self._array, 1)
+        ioctl(self._device, self._get, data, 1)
+        self._values = self._layout.unpack(data.tostring())
     
     def put_info(self):
     
-        if hasattr(self, "_put"):
-            # Obtain data about the device in the array (mutable = 1).
-            fcntl.ioctl(self._device, self._put, self._array, 0)
+        if not hasattr(self, "_put"):
+            self.get_info()
+            return
         
-        self.get_info()
+        # The driver returns the values it actually used in the array.
+        data = array.array("c", self._layout.pack(self._values))
+        ioctl(self._device, self._put, data, 1)
+        self._values = self._layout.unpack(data.tostring())
+    
+    def snapshot(self):
+    
+        """Returns an immutable copy of the current values."""
+        
+        return self._snapshot(self._values)
     
 
 class VirtualScreenInfo(ScreenInfo):
@@ -138,8 +212,17 @@ class VirtualScreenInfo(ScreenInfo):
         ("reserved", "IIIII")
         )
     
+    _layout = Layout(_definitions)
+    
     _get = FBIOGET_VSCREENINFO
     _put = FBIOPUT_VSCREENINFO
+    
+    def pan(self):
+    
+        # Pan the display to the current xoffset and yoffset values. Only the
+        # offsets are used by the driver, so the other values stay valid.
+        data = array.array("c", self._layout.pack(self._values))
+        ioctl(self._device, FBIOPAN_DISPLAY, data, 0)
 
 
 class FixedScreenInfo(ScreenInfo):
@@ -161,23 +244,253 @@ class FixedScreenInfo(ScreenInfo):
         ("reserved", "HHH")
         )
     
+    _layout = Layout(_definitions)
+    
     _get = FBIOGET_FSCREENINFO
 
 
+class Snapshot(object):
+
+    """An immutable copy of the values of a screen information structure."""
+    
+    __slots__ = ()
+    
+    def __init__(self, values):
+    
+        layout = self._layout
+        for name in layout.names:
+            object.__setattr__(self, name, layout.value(values, name))
+    
+    def __setattr__(self, name, value):
+    
+        raise AttributeError("Screen information snapshots cannot be changed.")
+    
+    def __eq__(self, other):
+    
+        return self.__class__ == other.__class__ and not self.changes(other)
+    
+    def __ne__(self, other):
+    
+        return not self.__eq__(other)
+    
+    def changes(self, other):
+    
+        """Returns a dictionary mapping the names of the fields that differ
+        between this snapshot and the other one to (old, new) pairs."""
+        
+        changes = {}
+        for name in self.__slots__:
+            old = getattr(self, name)
+            new = getattr(other, name)
+            if old != new:
+                changes[name] = (old, new)
+        
+        return changes
+
+
+class VirtualScreenSnapshot(Snapshot):
+
+    __slots__ = VirtualScreenInfo._layout.names
+    _layout = VirtualScreenInfo._layout
+
+
+class FixedScreenSnapshot(Snapshot):
+
+    __slots__ = FixedScreenInfo._layout.names
+    _layout = FixedScreenInfo._layout
+
+
+VirtualScreenInfo._snapshot = VirtualScreenSnapshot
+FixedScreenInfo._snapshot = FixedScreenSnapshot
+
+# Fields of the virtual screen information that can change without changing
+# the layout of the framebuffer memory.
+_panning_fields = ("xoffset", "yoffset", "activate")
+
+
+class FramebufferGeometry:
+
+    """Describes the layout of the framebuffer memory, using the virtual and
+    fixed screen information obtained from the device. The visible area is
+    mapped once for each of the requested number of pages, if the virtual
+    area is large enough to hold them. The information is kept in the
+    virtual and fixed attributes."""
+    
+    def __init__(self, virtual_info, fixed_info, pages = 1):
+    
+        self.virtual = v = virtual_info
+        self.fixed = f = fixed_info
+        
+        self.bits_per_pixel = v.bits_per_pixel
+        self.bytes_per_pixel = (v.bits_per_pixel + 7) / 8
+        self.grayscale = v.grayscale
+        self.red = v.red
+        self.green = v.green
+        self.blue = v.blue
+        self.transp = v.transp
+        
+        self.virtual_width = v.xres_virtual
+        self.virtual_height = v.yres_virtual
+        self.xoffset = v.xoffset
+        self.yoffset = v.yoffset
+        
+        # Some drivers do not report the line length, so fall back to the
+        # minimum length needed for the virtual width.
+        self.stride = f.line_length
+        if self.stride == 0:
+            self.stride = (v.xres_virtual * v.bits_per_pixel + 7) / 8
+        
+        self.memory_length = f.smem_len
+        if self.memory_length == 0:
+            self.memory_length = self.stride * v.yres_virtual
+        
+        # Only map the visible area of each page, limited to the rows that
+        # are actually backed by framebuffer memory.
+        self.width = min(v.xres, (self.stride * 8) / v.bits_per_pixel)
+        self.height = min(v.yres, self.memory_length / self.stride)
+        
+        rows = min(v.yres_virtual, self.memory_length / self.stride)
+        self.pages = max(1, min(pages, rows / self.height))
+        self.map_length = self.stride * self.height * self.pages
+        
+        self.row_offsets = range(0, self.map_length, self.stride)
+    
+    def offset(self, x, y, page = 0):
+    
+        return self.row_offsets[(page * self.height) + y] + \
+               (x * self.bits_per_pixel) / 8
+
+
+class ModeChange:
+
+    """Collects changes to the fields of the virtual screen information and
+    applies them all with a single FBIOPUT_VSCREENINFO ioctl when commit() is
+    called. When used in a with statement, the changes are committed at the
+    end of the block unless an exception occurred."""
+    
+    def __init__(self, fb):
+    
+        self.fb = fb
+        self.changes = {}
+    
+    def __enter__(self):
+    
+        return self
+    
+    def __exit__(self, type, value, traceback):
+    
+        if type is None:
+            self.commit()
+        return False
+    
+    def set(self, **fields):
+    
+        for name in fields:
+            if name not in VirtualScreenInfo._layout.fields:
+                raise AttributeError("No screen information field named '%s'." % name)
+        
+        self.changes.update(fields)
+    
+    def greyscale(self, bits_per_pixel = 8):
+    
+        """Requests a greyscale mode with the given depth."""
+        
+        self.set(bits_per_pixel = bits_per_pixel, grayscale = 1,
+                 red = (0, bits_per_pixel, 0), green = (0, bits_per_pixel, 0),
+                 blue = (0, bits_per_pixel, 0), transp = (0, 0, 0))
+    
+    def rgb565(self):
+    
+        self.set(bits_per_pixel = 16, grayscale = 0, red = (11, 5, 0),
+                 green = (5, 6, 0), blue = (0, 5, 0), transp = (0, 0, 0))
+    
+    def rotate(self, rotation):
+    
+        """Requests one of the FB_ROTATE_* rotations. The resolutions are
+        exchanged if the orientation of the screen changes."""
+        
+        v = self.fb.virtual_screen_info()
+        current = self.changes.get("rotate", v.rotate)
+        
+        if (rotation - current) % 2 != 0:
+            self.set(xres = self.changes.get("yres", v.yres),
+                     yres = self.changes.get("xres", v.xres),
+                     xres_virtual = self.changes.get("yres_virtual", v.yres_virtual),
+                     yres_virtual = self.changes.get("xres_virtual", v.xres_virtual),
+                     xoffset = 0, yoffset = 0)
+        
+        self.set(rotate = rotation)
+    
+    def check(self, v, f):
+    
+        """Raises a ValueError if the mode described by the virtual screen
+        information, v, cannot be used with the fixed screen information, f."""
+        
+        if v.bits_per_pixel not in (1, 2, 4, 8, 16, 24, 32):
+            raise ValueError("Invalid depth: %i bits per pixel." % v.bits_per_pixel)
+        
+        if v.xres > v.xres_virtual or v.yres > v.yres_virtual or \
+           v.xoffset + v.xres > v.xres_virtual or \
+           v.yoffset + v.yres > v.yres_virtual:
+            raise ValueError("The visible area does not fit in the virtual "
+                             "screen.")
+        
+        line_length = (v.xres_virtual * v.bits_per_pixel + 7) / 8
+        if f.smem_len and line_length * v.yres_virtual > f.smem_len:
+            raise ValueError("The virtual screen needs %i bytes but only %i "
+                             "are available." % (line_length * v.yres_virtual,
+                                                 f.smem_len))
+    
+    def commit(self):
+    
+        """Applies the changes to the device and returns the resulting
+        VirtualScreenInfo, which may differ from the one requested if the
+        driver adjusted it. Any mapping of the framebuffer memory is
+        discarded, so buffers, views and images obtained from the
+        framebuffer must be obtained again."""
+        
+        v = self.fb.virtual_screen_info()
+        if not self.changes:
+            return v
+        
+        for name, value in self.changes.items():
+            setattr(v, name, value)
+        
+        self.check(v, self.fb.fixed_screen_info())
+        
+        self.fb._unmap()
+        v.put_info()
+        self.changes = {}
+        
+        if self.fb._page * self.fb.geometry().height >= v.yres_virtual:
+            self.fb._page = 0
+        
+        return v
+
+
 class Framebuffer:
 
     def __init__(self, path):
     
-        self._device = open(path, "r+")
+        self._setup(open(path, "r+"))
+    
+    def _setup(self, device):
+    
+        self._device = device
         self._buffer = None
+        self._view = None
+        self._geometry = None
+        self._info = None
+        self._pages = 1
+        self._page = 0
     
     def blank(self, value = VESA_POWERDOWN):
     
-        fcntl.ioctl(self._device, FBIOBLANK, value)
+        ioctl(self._device, FBIOBLANK, value)
     
     def unblank(self):
     
-        fcntl.ioctl(self._device, FBIOBLANK, VESA_NO_BLANKING)
+        ioctl(self._device, FBIOBLANK, VESA_NO_BLANKING)
     
     def virtual_screen_info(self):
     
@@ -187,20 +500,938 @@ class Framebuffer:
     
         return FixedScreenInfo(self._device)
     
+    def mode_change(self):
+    
+        """Returns a ModeChange object for changing the display mode."""
+        
+        return ModeChange(self)
+    
+    def geometry(self):
+    
+        """Returns the FramebufferGeometry describing the layout of the
+        framebuffer memory, reading it from the device the first time."""
+        
+        if not self._geometry:
+            self._info = self.virtual_screen_info()
+            self._geometry = FramebufferGeometry(self._info.snapshot(),
+                                                 self.fixed_screen_info().snapshot(),
+                                                 self._pages)
+        return self._geometry
+    
+    def check_mode(self):
+    
+        """Reads the virtual screen information from the device and compares
+        it with the information used for the current geometry. If the mode
+        has changed, the framebuffer memory is unmapped so that it is mapped
+        again with the new layout when it is next used. Returns a dictionary
+        of the changed fields, as returned by Snapshot.changes()."""
+        
+        current = self.geometry().virtual
+        changes = current.changes(self.virtual_screen_info().snapshot())
+        
+        for name in _panning_fields:
+            changes.pop(name, None)
+        
+        if changes:
+            self._unmap()
+        
+        return changes
+    
+    def _unmap(self):
+    
+        self._view = None
+        self._geometry = None
+        self._info = None
+        if self._buffer:
+            self._buffer.close()
+            self._buffer = None
+    
+    def enable_double_buffering(self):
+    
+        """Maps two pages of the virtual screen so that drawing operations can
+        write to the page that is not displayed, then show it with flip().
+        Returns True if the device supports this or False otherwise."""
+        
+        v = self.virtual_screen_info()
+        if v.yres_virtual < 2 * v.yres:
+            v.yres_virtual = 2 * v.yres
+            try:
+                v.put_info()
+            except IOError:
+                return False
+        
+        self._pages = 2
+        self._unmap()
+        g = self.geometry()
+        
+        if g.pages < 2:
+            self._pages = 1
+            self._unmap()
+            return False
+        
+        # Draw into whichever page is not currently being displayed.
+        self._page = 1 - min(1, g.yoffset / g.height)
+        return True
+    
+    def drawing_page(self):
+    
+        return self._page
+    
+    def flip(self):
+    
+        """Displays the page that was being drawn into and makes the other
+        page the target for drawing operations. The new drawing page still
+        contains the frame that was displayed before."""
+        
+        if self._pages < 2:
+            return
+        
+        # Reuse the information read for the geometry instead of reading it
+        # again for each frame.
+        g = self.geometry()
+        self._info.yoffset = self._page * g.height
+        self._info.pan()
+        
+        self._page = (self._page + 1) % self._pages
+    
     def get_buffer(self):
     
         if not self._buffer:
         
-            v = VirtualScreenInfo(self._device)
+            g = self.geometry()
+            self._buffer = mmap.mmap(self._device.fileno(), g.map_length)
+        
+        return self._buffer
+    
+    def get_view(self):
+    
+        """Returns a writable ctypes character array that shares its memory
+        with the mapped framebuffer."""
+        
+        b = self.get_buffer()
+        if not self._view:
+            self._view = (ctypes.c_char * len(b)).from_buffer(b)
+        
+        return self._view
+    
+    def get_image(self):
+    
+        """Returns a QImage that wraps the mapped framebuffer memory of the
+        drawing page so that painters can draw directly into it. The image is
+        only valid for as long as the framebuffer object exists and the mode
+        is unchanged. For 8-bit greyscale modes, the image uses the Indexed8
+        format with a grey colour table, which QPainter cannot draw into."""
+        
+        from PyQt4.QtGui import QImage, qRgb
+        import sip
+        
+        formats = {16: QImage.Format_RGB16, 32: QImage.Format_RGB32}
+        
+        view = self.get_view()
+        g = self.geometry()
+        if g.bits_per_pixel == 8 and g.grayscale:
+            format = QImage.Format_Indexed8
+        else:
+            try:
+                format = formats[g.bits_per_pixel]
+            except KeyError:
+                raise ValueError("Cannot create a QImage for a framebuffer with "
+                                 "%i bits per pixel." % g.bits_per_pixel)
+        
+        address = ctypes.addressof(view) + g.offset(0, 0, self._page)
+        image = QImage(sip.voidptr(address), g.width, g.height, g.stride, format)
+        
+        if format == QImage.Format_Indexed8:
+            image.setColorTable(map(lambda v: qRgb(v, v, v), range(256)))
+        
+        return image
+    
+    def blit(self, image, rect = None, stride = None, position = None):
+    
+        """Copies the region of the image described by rect to the same place
+        in the drawing page of the framebuffer, or to the (x, y) position if
+        one is given. The image is either a QImage or a string of pixel data
+        with the given stride, and must use the framebuffer's pixel format.
+        The rect is a QRect or an (x, y, width, height) tuple; if it is
+        omitted, the whole image is copied. At depths below 8 bits per pixel,
+        the region is widened to whole bytes and the position must be a
+        whole number of bytes away from it."""
+        
+        b = self.get_buffer()
+        g = self.geometry()
+        bits = g.bits_per_pixel
+        
+        data, stride, width, height = _image_data(image, stride, bits)
+        
+        if rect is None:
+            x, y, w, h = 0, 0, width, height
+        else:
+            x, y, w, h = _rect_tuple(rect)
+        
+        # Find the offset from the region to its place on the screen.
+        if position is None:
+            dx = dy = 0
+        else:
+            dx = position[0] - x
+            dy = position[1] - y
+        
+        # Clip the region to the image and its destination to the screen.
+        x1 = max(0, x, -dx)
+        y1 = max(0, y, -dy)
+        x2 = min(x + w, width, g.width - dx)
+        y2 = min(y + h, height, g.height - dy)
+        
+        if x1 >= x2 or y1 >= y2:
+            return
+        
+        if bits < 8:
+            # Pixels that share a byte are copied together, so they cannot be
+            # moved by part of a byte.
+            pixels = 8 / bits
+            if dx % pixels != 0:
+                raise ValueError("Images can only be moved by whole bytes at "
+                                 "%i bits per pixel." % bits)
+            x1 -= x1 % pixels
+            x2 += -x2 % pixels
+        
+        src = (y1 * stride) + (x1 * bits) / 8
+        dest = g.offset(x1 + dx, y1 + dy, self._page)
+        
+        if x1 == 0 and x2 == width and dx == 0 and stride == g.stride:
+            # The rows are contiguous in both the image and the framebuffer,
+            # so copy them in one operation.
+            length = (y2 - y1) * stride
+            b[dest:dest + length] = data[src:src + length]
+            return
+        
+        length = ((x2 - x1) * bits) / 8
+        
+        top = (self._page * g.height) + dy
+        
+        for dest in g.row_offsets[top + y1:top + y2]:
+            dest += ((x1 + dx) * bits) / 8
+            b[dest:dest + length] = data[src:src + length]
+            src += stride
+
+    def blit_rotated(self, image, rotation, rect = None, stride = None):
+    
+        """Copies the region of the image described by rect to the drawing
+        page, rotating the whole image clockwise by the number of quarter
+        turns given by one of the FB_ROTATE_* values so that its top-left
+        corner is placed at the corresponding corner of the screen. The image
+        and rect are given as for blit(). Rows are processed in blocks so
+        that columns can be read with slices of each block."""
+        
+        b = self.get_buffer()
+        g = self.geometry()
+        rotation = rotation % 4
+        
+        if g.bits_per_pixel not in _array_types:
+            raise ValueError("Cannot rotate images for a framebuffer with %i "
+                             "bits per pixel." % g.bits_per_pixel)
+        
+        data, stride, width, height = _image_data(image, stride, g.bits_per_pixel)
+        
+        if rect is None:
+            rect = (0, 0, width, height)
+        
+        # Clip the region to the image and to the part of it that lies on
+        # the screen after rotation.
+        if rotation % 2 == 0:
+            area = (width, height)
+        else:
+            area = (height, width)
+        
+        screen = _rotate_rect((0, 0, g.width, g.height), -rotation, area[0], area[1])
+        rect = _intersect(_rect_tuple(rect), (0, 0, width, height))
+        if rect:
+            rect = _intersect(rect, screen)
+        if not rect:
+            return
+        
+        x, y, w, h = rect
+        bpp = g.bytes_per_pixel
+        typecode = _array_types[g.bits_per_pixel]
+        page = self._page
+        
+        if rotation == FB_ROTATE_UR:
+            self.blit(image, rect, stride)
+            return
+        
+        if rotation == FB_ROTATE_UD:
+            for row in xrange(y, y + h):
+                start = (row * stride) + (x * bpp)
+                pixels = array.array(typecode, data[start:start + w * bpp])
+                pixels.reverse()
+                dest = g.offset(width - x - w, height - 1 - row, page)
+                b[dest:dest + w * bpp] = pixels.tostring()
+            return
+        
+        block_size = _rotation_block_size
+        
+        for top in xrange(y, y + h, block_size):
+        
+            rows = min(block_size, y + h - top)
             
-            bytes_per_pixel = v.bits_per_pixel / 8
-            if v.bits_per_pixel % 8 != 0:
-                bytes_per_pixel += 1
+            # Collect a block of rows of the region into one array so that
+            # each column of the block is a slice with a step of w pixels.
+            block = array.array(typecode)
+            for row in xrange(top, top + rows):
+                start = (row * stride) + (x * bpp)
+                block.fromstring(data[start:start + w * bpp])
             
-            extra = v.xres % 32
-            if extra != 0:
-                extra = (32 - extra)*bytes_per_pixel
+            for column in xrange(w):
             
-            self._buffer = mmap.mmap(self._device.fileno(), ((v.xres * bytes_per_pixel) + extra) * v.yres)
+                pixels = block[column::w]
+                
+                if rotation == FB_ROTATE_CW:
+                    # Source columns become screen rows, read from the bottom.
+                    pixels.reverse()
+                    dest = g.offset(height - top - rows, x + column, page)
+                else:
+                    dest = g.offset(top, width - 1 - x - column, page)
+                
+                b[dest:dest + rows * bpp] = pixels.tostring()
+    
+    def grab(self, rect = None, image = False):
+    
+        """Reads the region described by rect from the drawing page, or the
+        whole page if rect is omitted. The rect is a QRect or an (x, y, width,
+        height) tuple and is clipped to the screen. Returns a tuple containing
+        a string of pixel data in the framebuffer format and its stride, or
+        a QImage if image is True. If the rect lies outside the screen, the
+        data is empty and its stride is zero, or the QImage has no pixels."""
         
-        return self._buffer
+        b = self.get_buffer()
+        g = self.geometry()
+        
+        if rect is None:
+            x, y, w, h = 0, 0, g.width, g.height
+        else:
+            x, y, w, h = _rect_tuple(rect)
+        
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(x + w, g.width)
+        y2 = min(y + h, g.height)
+        
+        if x1 >= x2 or y1 >= y2:
+            if image:
+                return self._grab_image(0, 0, 0, 0)
+            return "", 0
+        
+        if image:
+            return self._grab_image(x1, y1, x2 - x1, y2 - y1)
+        
+        # Include whole bytes for depths with more than one pixel per byte.
+        start = g.offset(x1, y1, self._page)
+        length = (x2 * g.bits_per_pixel + 7) / 8 - (x1 * g.bits_per_pixel) / 8
+        
+        if length == g.stride:
+            # The rows are contiguous, so read them in one operation.
+            return b[start:start + (y2 - y1) * g.stride], g.stride
+        
+        rows = []
+        for start in xrange(start, start + (y2 - y1) * g.stride, g.stride):
+            rows.append(b[start:start + length])
+        
+        return "".join(rows), length
+    
+    def _grab_image(self, x, y, width, height):
+    
+        from PyQt4.QtGui import QImage, qRgb
+        
+        formats = {16: QImage.Format_RGB16, 32: QImage.Format_RGB32}
+        
+        g = self.geometry()
+        if g.bits_per_pixel in formats:
+            image = QImage(width, height, formats[g.bits_per_pixel])
+        elif g.bits_per_pixel == 8 and g.grayscale:
+            image = QImage(width, height, QImage.Format_Indexed8)
+            image.setColorTable(map(lambda v: qRgb(v, v, v), range(256)))
+        else:
+            raise ValueError("Cannot create a QImage for a framebuffer with "
+                             "%i bits per pixel." % g.bits_per_pixel)
+        
+        # Copy each row from the framebuffer memory directly into the image.
+        address = ctypes.addressof(self.get_view())
+        length = width * g.bytes_per_pixel
+        
+        for row in xrange(height):
+            source = address + g.offset(x, y + row, self._page)
+            ctypes.memmove(int(image.scanLine(row)), source, length)
+        
+        return image
+    
+    def show_frame(self, path):
+    
+        """Copies a frame saved by save_frame() to the drawing page in one
+        operation. Raises ValueError if the frame was saved for a different
+        mode."""
+        
+        g = self.geometry()
+        
+        f = open(path, "rb")
+        header = f.read(_frame_header.size)
+        if len(header) != _frame_header.size or \
+           _frame_header.unpack(header)[0] != _frame_magic:
+            raise ValueError("%s is not a framebuffer frame file." % path)
+        
+        if header != _frame_header_for(g):
+            raise ValueError("%s was saved for a different display mode." % path)
+        
+        length = g.stride * g.height
+        data = f.read(length)
+        f.close()
+        
+        if len(data) != length:
+            raise ValueError("%s is incomplete." % path)
+        
+        b = self.get_buffer()
+        start = g.offset(0, 0, self._page)
+        b[start:start + length] = data
+    
+    def save_png(self, path):
+    
+        """Saves the visible contents of the drawing page as a PNG file."""
+        
+        import pixelformat
+        
+        b = self.get_buffer()
+        g = self.geometry()
+        start = g.offset(0, 0, self._page)
+        data = b[start:start + g.stride * g.height]
+        
+        rgb = pixelformat.to_rgb(data, g.width, g.height, g.stride,
+                                 pixelformat.screen_format(g))
+        _write_png(path, g.width, g.height, rgb)
+
+
+class SimulatedDevice:
+
+    """Emulates the screen information, blanking and panning ioctls of a
+    framebuffer device, keeping the framebuffer memory in an ordinary file."""
+    
+    def __init__(self, file, xres, yres, bits_per_pixel, line_length,
+                       yres_virtual, grayscale, fields):
+    
+        self._file = file
+        self.blank_level = VESA_NO_BLANKING
+        self.pans = 0
+        self.mode_changes = 0
+        
+        red, green, blue, transp = fields
+        self._virtual = VirtualScreenInfo._layout.pack_fields(
+            xres = xres, yres = yres, xres_virtual = xres,
+            yres_virtual = yres_virtual, bits_per_pixel = bits_per_pixel,
+            grayscale = grayscale, red = red, green = green, blue = blue,
+            transp = transp)
+        
+        self._fixed = FixedScreenInfo._layout.pack_fields(
+            id = "simulated", smem_len = line_length * yres_virtual,
+            type = FB_TYPE_PACKED_PIXELS, visual = FB_VISUAL_TRUECOLOR,
+            ypanstep = 1, line_length = line_length)
+        
+        self._file.truncate(line_length * yres_virtual)
+    
+    def fileno(self):
+    
+        return self._file.fileno()
+    
+    def ioctl(self, request, arg, mutate):
+    
+        if request == FBIOGET_VSCREENINFO:
+            arg[:] = array.array("c", self._virtual)
+        
+        elif request == FBIOGET_FSCREENINFO:
+            arg[:] = array.array("c", self._fixed)
+        
+        elif request == FBIOPUT_VSCREENINFO:
+            v = VirtualScreenInfo._layout.unpack_fields(arg.tostring())
+            f = FixedScreenInfo._layout.unpack_fields(self._fixed)
+            
+            # Only accept modes that fit in the framebuffer memory.
+            line_length = (v["xres_virtual"] * v["bits_per_pixel"] + 7) / 8
+            if line_length * v["yres_virtual"] > f["smem_len"] or \
+                v["xres"] > v["xres_virtual"] or v["yres"] > v["yres_virtual"]:
+                raise IOError(errno.EINVAL, "Invalid argument")
+            
+            f["line_length"] = line_length
+            self._virtual = arg.tostring()
+            self.mode_changes += 1
+            self._fixed = FixedScreenInfo._layout.pack_fields(**f)
+        
+        elif request == FBIOPAN_DISPLAY:
+            v = VirtualScreenInfo._layout.unpack_fields(self._virtual)
+            pan = VirtualScreenInfo._layout.unpack_fields(arg.tostring())
+            
+            if pan["yoffset"] + v["yres"] > v["yres_virtual"] or \
+                pan["xoffset"] + v["xres"] > v["xres_virtual"]:
+                raise IOError(errno.EINVAL, "Invalid argument")
+            
+            v["xoffset"] = pan["xoffset"]
+            v["yoffset"] = pan["yoffset"]
+            self._virtual = VirtualScreenInfo._layout.pack_fields(**v)
+            self.pans += 1
+        
+        elif request == FBIOBLANK:
+            self.blank_level = arg
+        
+        else:
+            raise IOError(errno.ENOTTY, "Inappropriate ioctl for device")
+        
+        return 0
+
+
+class SimulatedFramebuffer(Framebuffer):
+
+    """A framebuffer that is backed by an ordinary file, or by an anonymous
+    temporary file if no path is given, for use where no framebuffer device
+    is available. The resolution, depth and line length can be specified,
+    with the line length defaulting to the minimum needed for each row."""
+    
+    def __init__(self, path = None, xres = 800, yres = 600,
+                       bits_per_pixel = 16, line_length = None,
+                       yres_virtual = None, grayscale = None):
+    
+        if path:
+            file = open(path, "w+b")
+        else:
+            file = tempfile.TemporaryFile()
+        
+        if line_length is None:
+            line_length = (xres * bits_per_pixel + 7) / 8
+        if yres_virtual is None:
+            yres_virtual = yres
+        if grayscale is None:
+            grayscale = int(bits_per_pixel <= 8)
+        
+        if bits_per_pixel == 16 and not grayscale:
+            fields = ((11, 5, 0), (5, 6, 0), (0, 5, 0), (0, 0, 0))
+        elif bits_per_pixel == 32 and not grayscale:
+            fields = ((16, 8, 0), (8, 8, 0), (0, 8, 0), (24, 8, 0))
+        else:
+            fields = ((0, bits_per_pixel, 0),) * 3 + ((0, 0, 0),)
+        
+        self._setup(SimulatedDevice(file, xres, yres, bits_per_pixel,
+                    line_length, yres_virtual, grayscale, fields))
+
+
+class FramebufferWriter:
+
+    """Copies images to a framebuffer in a separate thread. Jobs are placed on
+    a queue of at most maxsize entries by submit(), which only blocks when
+    the queue is full. Pending jobs that are covered by a new job from the
+    same image are dropped, and those that meet it are merged with it unless
+    the merged region would cover a pending job for another image.
+    QImages in other formats are converted to the framebuffer format in the
+    writer thread. If a callback is given, it is called from the writer
+    thread with each rect after it has been copied. The last exception
+    raised while copying is kept in the error attribute and raised by the
+    next call to flush()."""
+    
+    def __init__(self, fb, maxsize = 8, callback = None):
+    
+        self.fb = fb
+        self.maxsize = maxsize
+        self.callback = callback
+        
+        self._jobs = []
+        self._busy = False
+        self._stopping = False
+        self._condition = threading.Condition()
+        self.error = None
+        
+        self.stats = {"submitted": 0, "dropped": 0, "merged": 0, "copied": 0,
+                      "failed": 0, "max depth": 0, "total copy time": 0.0,
+                      "max copy time": 0.0, "total latency": 0.0,
+                      "max latency": 0.0}
+        
+        self._thread = threading.Thread(target = self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+    
+    def submit(self, image, rect = None, stride = None):
+    
+        """Queues the region of the image described by rect to be copied to
+        the same place in the framebuffer, as with Framebuffer.blit(). String
+        data must not be modified after it is submitted, but a QImage can be
+        because the writer copies the part of it that is needed. Raises
+        RuntimeError if the writer has been stopped."""
+        
+        # Check the image here so that errors are reported to the caller.
+        width, height = _image_data(image, stride,
+                                    self.fb.geometry().bits_per_pixel)[2:]
+        if rect is None:
+            rect = (0, 0, width, height)
+        else:
+            rect = _rect_tuple(rect)
+        
+        self._condition.acquire()
+        try:
+            if self._stopping:
+                raise RuntimeError("Cannot submit images to a stopped writer.")
+            
+            self.stats["submitted"] += 1
+            submitted = time.time()
+            
+            for job in self._jobs[:]:
+            
+                if job[0] is not image:
+                    continue
+                
+                if _contains(rect, job[2]):
+                    self._jobs.remove(job)
+                    self.stats["dropped"] += 1
+                elif _meets(rect, job[2]):
+                
+                    # The merged job is copied after any jobs for other images
+                    # that are already queued, so only merge if none of them
+                    # would be covered by it.
+                    union = _union(rect, job[2])
+                    if self._overlaps_others(image, union):
+                        continue
+                    
+                    self._jobs.remove(job)
+                    rect = union
+                    submitted = min(submitted, job[4])
+                    self.stats["merged"] += 1
+            
+            while len(self._jobs) >= self.maxsize and not self._stopping:
+                self._condition.wait()
+            
+            if self._stopping:
+                raise RuntimeError("Cannot submit images to a stopped writer.")
+            
+            if hasattr(image, "bits"):
+                data, position = self._copy_region(image, rect)
+                if data is None:
+                    return
+            else:
+                data, position = image, None
+            
+            self._jobs.append((image, data, rect, stride, submitted, position))
+            self.stats["max depth"] = max(self.stats["max depth"], len(self._jobs))
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+    
+    def depth(self):
+    
+        return len(self._jobs)
+    
+    def mean_copy_time(self):
+    
+        if self.stats["copied"] == 0:
+            return 0.0
+        return self.stats["total copy time"] / self.stats["copied"]
+    
+    def mean_latency(self):
+    
+        if self.stats["copied"] == 0:
+            return 0.0
+        return self.stats["total latency"] / self.stats["copied"]
+    
+    def flush(self):
+    
+        """Waits until all queued jobs have been copied. If any of them could
+        not be copied, the last error that occurred is raised."""
+        
+        self._condition.acquire()
+        try:
+            while self._jobs or self._busy:
+                self._condition.wait()
+            
+            error = self.error
+            self.error = None
+        finally:
+            self._condition.release()
+        
+        if error:
+            raise error
+    
+    def stop(self):
+    
+        """Copies any queued jobs and stops the writer thread. Errors are
+        raised as for flush()."""
+        
+        try:
+            self.flush()
+        finally:
+            self._condition.acquire()
+            self._stopping = True
+            self._condition.notifyAll()
+            self._condition.release()
+            self._thread.join()
+    
+    def _run(self):
+    
+        import pixelformat
+        format = pixelformat.screen_format(self.fb.geometry())
+        
+        while True:
+        
+            self._condition.acquire()
+            try:
+                while not self._jobs and not self._stopping:
+                    self._condition.wait()
+                
+                if not self._jobs:
+                    return
+                
+                source, data, rect, stride, submitted, position = self._jobs.pop(0)
+                self._busy = True
+                self._condition.notifyAll()
+            finally:
+                self._condition.release()
+            
+            started = time.time()
+            error = None
+            
+            try:
+                if position is None:
+                    self.fb.blit(data, rect, stride)
+                elif self._needs_conversion(data, format):
+                    self._blit_converted(data, format, position)
+                else:
+                    self.fb.blit(data, None, None, position)
+            
+            except Exception, exception:
+                # Keep the thread running so that callers are not left
+                # waiting, and report the error from flush().
+                error = exception
+            
+            finished = time.time()
+            
+            self._condition.acquire()
+            self._busy = False
+            
+            if error:
+                self.error = error
+                self.stats["failed"] += 1
+            else:
+                self.stats["copied"] += 1
+                self.stats["total copy time"] += finished - started
+                self.stats["max copy time"] = max(self.stats["max copy time"],
+                                                  finished - started)
+                self.stats["total latency"] += finished - submitted
+                self.stats["max latency"] = max(self.stats["max latency"],
+                                                finished - submitted)
+            
+            self._condition.notifyAll()
+            self._condition.release()
+            
+            if self.callback and not error:
+                self.callback(rect)
+    
+    def _overlaps_others(self, image, rect):
+    
+        for job in self._jobs:
+            if job[0] is not image and _intersect(job[2], rect):
+                return True
+        
+        return False
+    
+    def _copy_region(self, image, rect):
+    
+        # Copy the part of the region that lies inside the QImage, so that
+        # the caller can carry on painting into it. For depths below 8 bits
+        # per pixel, the region is widened to whole bytes in the framebuffer.
+        x, y, w, h = rect
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(x + w, image.width())
+        y2 = min(y + h, image.height())
+        
+        bits = self.fb.geometry().bits_per_pixel
+        if bits < 8:
+            pixels = 8 / bits
+            x1 -= x1 % pixels
+            x2 = min(x2 + (-x2 % pixels), image.width())
+        
+        if x1 >= x2 or y1 >= y2:
+            return None, None
+        
+        return image.copy(x1, y1, x2 - x1, y2 - y1), (x1, y1)
+    
+    def _needs_conversion(self, image, format):
+    
+        import pixelformat
+        source = pixelformat._qimage_formats.get(image.format())
+        
+        if format.grayscale:
+            return True
+        elif format.bits_per_pixel == 16:
+            return source != pixelformat.RGB16 or \
+                   (format.red, format.green, format.blue) != \
+                   (pixelformat.RGB565.red, pixelformat.RGB565.green,
+                    pixelformat.RGB565.blue)
+        else:
+            return source not in (pixelformat.RGB32, pixelformat.ARGB32)
+    
+    def _blit_converted(self, image, format, position):
+    
+        import pixelformat
+        g = self.fb.geometry()
+        x, y = position
+        
+        # Clip the image to the screen before converting it.
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x2 = min(image.width(), g.width - x)
+        y2 = min(image.height(), g.height - y)
+        
+        if x1 >= x2 or y1 >= y2:
+            return
+        
+        if format.bits_per_pixel < 8:
+            # Align the region to whole bytes in the framebuffer.
+            pixels = 8 / format.bits_per_pixel
+            x1 -= (x + x1) % pixels
+            x2 = min(x2 + (-(x + x2) % pixels), image.width())
+        
+        data, line_length = pixelformat.convert_image(image, format,
+                                                      (x1, y1, x2 - x1, y2 - y1))
+        b = self.fb.get_buffer()
+        page = self.fb.drawing_page()
+        
+        for row in range(y2 - y1):
+            start = row * line_length
+            dest = g.offset(x + x1, y + y1 + row, page)
+            b[dest:dest + line_length] = data[start:start + line_length]
+
+
+def _contains(outer, inner):
+
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and \
+           outer[0] + outer[2] >= inner[0] + inner[2] and \
+           outer[1] + outer[3] >= inner[1] + inner[3]
+
+def _meets(a, b):
+
+    return a[0] <= b[0] + b[2] and b[0] <= a[0] + a[2] and \
+           a[1] <= b[1] + b[3] and b[1] <= a[1] + a[3]
+
+def _union(a, b):
+
+    x = min(a[0], b[0])
+    y = min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x,
+                  max(a[1] + a[3], b[1] + b[3]) - y)
+
+def _write_png(path, width, height, rgb):
+
+    def chunk(kind, data):
+    
+        return struct.pack(">I", len(data)) + kind + data + \
+               struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    
+    # Each row of RGB data is preceded by a filter type of zero.
+    row_length = width * 3
+    rows = []
+    for start in xrange(0, row_length * height, row_length):
+        rows.append("\x00" + rgb[start:start + row_length])
+    
+    f = open(path, "wb")
+    f.write("\x89PNG\r\n\x1a\n")
+    f.write(chunk("IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+    f.write(chunk("IDAT", zlib.compress("".join(rows))))
+    f.write(chunk("IEND", ""))
+    f.close()
+
+# Frame files start with a header describing the mode they were saved for,
+# followed by the rows of pixels using the framebuffer's stride.
+_frame_magic = "BXFR"
+_frame_header = struct.Struct("<4sHHIBB6B")
+
+def _frame_header_for(geometry):
+
+    g = geometry
+    return _frame_header.pack(_frame_magic, g.width, g.height, g.stride,
+                              g.bits_per_pixel, g.grayscale,
+                              g.red[0], g.red[1], g.green[0], g.green[1],
+                              g.blue[0], g.blue[1])
+
+def save_frame(path, data, geometry):
+
+    """Saves a screen of pixel data in the format described by the geometry,
+    with rows of the given width packed together, as a frame file that
+    Framebuffer.show_frame() can copy to the screen. The file is written
+    under a temporary name and then renamed, so that a partially written
+    frame is never shown."""
+    
+    g = geometry
+    length = g.stride * g.height
+    row_length = len(data) / g.height
+    
+    if row_length != g.stride:
+        # Pad each row to the stride of the framebuffer.
+        padding = "\x00" * (g.stride - row_length)
+        rows = []
+        for start in xrange(0, row_length * g.height, row_length):
+            rows.append(data[start:start + row_length] + padding)
+        data = "".join(rows)
+    
+    temp_path = path + ".new"
+    f = open(temp_path, "wb")
+    f.write(_frame_header_for(g))
+    f.write(data[:length])
+    f.close()
+    os.rename(temp_path, path)
+
+# Array types for pixels of each supported depth when rotating images, and the
+# number of rows processed at a time.
+_array_types = {8: "B", 16: "H", 32: "I"}
+_rotation_block_size = 32
+
+def _rotate_rect(rect, rotation, width, height):
+
+    """Returns the rect that the (x, y, width, height) rect in an area of the
+    given width and height occupies after the area is rotated clockwise by
+    the given number of quarter turns."""
+    
+    x, y, w, h = rect
+    rotation = rotation % 4
+    
+    if rotation == FB_ROTATE_CW:
+        return (height - y - h, x, h, w)
+    elif rotation == FB_ROTATE_UD:
+        return (width - x - w, height - y - h, w, h)
+    elif rotation == FB_ROTATE_CCW:
+        return (y, width - x - w, h, w)
+    else:
+        return rect
+
+def _intersect(a, b):
+
+    x1 = max(a[0], b[0])
+    y1 = max(a[1], b[1])
+    x2 = min(a[0] + a[2], b[0] + b[2])
+    y2 = min(a[1] + a[3], b[1] + b[3])
+    
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return (x1, y1, x2 - x1, y2 - y1)
+
+def _rect_tuple(rect):
+
+    # Accept QRect objects as well as plain tuples.
+    if callable(getattr(rect, "x", None)):
+        return rect.x(), rect.y(), rect.width(), rect.height()
+    
+    return tuple(rect)
+
+def _image_data(image, stride, bits_per_pixel):
+
+    """Returns a buffer containing the image data, the stride, and the width
+    and height of the image."""
+    
+    if hasattr(image, "bits"):
+        data = image.bits()
+        data.setsize(image.byteCount())
+        return buffer(data), image.bytesPerLine(), image.width(), image.height()
+    
+    if stride is None:
+        raise ValueError("A stride is required for string image data.")
+    
+    return buffer(image), stride, (stride * 8) / bits_per_pixel, len(image) / stride
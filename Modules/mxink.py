@@ -0,0 +1,422 @@
+"""
+mxink.py - Update control for the i.MX508 e-ink display controller.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import struct, time
+import linuxfb
+
+# See include/linux/mxcfb.h in the kernel sources for the origin of these
+# values and structures.
+UPDATE_MODE_PARTIAL = 0
+UPDATE_MODE_FULL    = 1
+
+WAVEFORM_MODE_INIT = 0
+WAVEFORM_MODE_DU   = 1
+WAVEFORM_MODE_GC16 = 2
+WAVEFORM_MODE_GC4  = 3
+WAVEFORM_MODE_AUTO = 257
+
+TEMP_USE_AMBIENT = 0x1000
+
+# struct mxcfb_update_data: the update region (top, left, width, height), the
+# waveform mode, update mode, update marker, temperature, alternate buffer
+# flag and the alternate buffer data.
+_update_data = struct.Struct("IIIIIIIiIIIIIIIII")
+
+def _IOW(type, number, size):
+
+    return (1 << 30) | (size << 16) | (ord(type) << 8) | number
+
+MXCFB_SEND_UPDATE = _IOW("F", 0x2e, _update_data.size)
+MXCFB_WAIT_FOR_UPDATE_COMPLETE = _IOW("F", 0x2f, 4)
+
+# Update modes, in increasing order of quality. When regions are merged, the
+# result uses the highest quality mode of the regions involved.
+FAST = 0        # Monochrome partial update
+GREYSCALE = 1   # Greyscale partial update
+FULL = 2        # Flashing greyscale update that also clears any ghosting
+
+_modes = {
+    FAST: (WAVEFORM_MODE_DU, UPDATE_MODE_PARTIAL),
+    GREYSCALE: (WAVEFORM_MODE_GC16, UPDATE_MODE_PARTIAL),
+    FULL: (WAVEFORM_MODE_GC16, UPDATE_MODE_FULL)
+    }
+
+class Device:
+
+    """Sends updates to the display controller using the ioctls of the MXC
+    EPDC framebuffer driver."""
+    
+    def __init__(self, fb):
+    
+        self._device = fb._device
+    
+    def send(self, rect, waveform, update_mode, marker):
+    
+        x, y, w, h = rect
+        data = _update_data.pack(y, x, w, h, waveform, update_mode, marker,
+                                 TEMP_USE_AMBIENT, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        linuxfb.ioctl(self._device, MXCFB_SEND_UPDATE, data)
+    
+    def wait(self, marker):
+    
+        linuxfb.ioctl(self._device, MXCFB_WAIT_FOR_UPDATE_COMPLETE,
+                      struct.pack("I", marker))
+
+
+class RecordingDevice:
+
+    """Records the updates that would be sent to the display controller, for
+    use in place of a Device when testing."""
+    
+    def __init__(self, fb = None):
+    
+        self.updates = []
+        self.waited = []
+    
+    def send(self, rect, waveform, update_mode, marker):
+    
+        self.updates.append((rect, waveform, update_mode, marker))
+    
+    def wait(self, marker):
+    
+        self.waited.append(marker)
+
+
+class Policy:
+
+    """The default refresh policy, which allows full refreshes whenever the
+    scheduler asks for them and never requests any itself."""
+    
+    def allow_refresh(self):
+    
+        return True
+    
+    def wants_refresh(self):
+    
+        return False
+    
+    def refreshed(self):
+    
+        pass
+
+
+class PageCountPolicy(Policy):
+
+    """Requests a full refresh after every given number of page turns, as a
+    reader application would want."""
+    
+    def __init__(self, pages):
+    
+        self.pages = pages
+        self.count = 0
+    
+    def page_turned(self):
+    
+        self.count += 1
+    
+    def wants_refresh(self):
+    
+        return self.pages > 0 and self.count >= self.pages
+    
+    def refreshed(self):
+    
+        self.count = 0
+
+
+class StrokePolicy(Policy):
+
+    """Prevents full refreshes while a stroke is being drawn, as a drawing
+    application would want."""
+    
+    def __init__(self):
+    
+        self.drawing = False
+    
+    def begin_stroke(self):
+    
+        self.drawing = True
+    
+    def end_stroke(self):
+    
+        self.drawing = False
+    
+    def allow_refresh(self):
+    
+        return not self.drawing
+
+
+class RefreshScheduler:
+
+    """Decides when a full refresh is needed to clear the ghosting left by
+    partial updates. The screen is divided into tiles, and the area of each
+    partial update is accumulated in the tiles it covers as a fraction of the
+    tile area. A refresh is due when any tile reaches the threshold, when the
+    screen has been idle for idle_time seconds after partial updates, or when
+    the policy requests one. The counters attribute records how often each of
+    these occurs, and how many refreshes the policy deferred."""
+    
+    def __init__(self, width, height, tile_size = 100, threshold = 4.0,
+                       idle_time = None, policy = None):
+    
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self.idle_time = idle_time
+        
+        if policy is None:
+            policy = Policy()
+        self.policy = policy
+        
+        self.columns = (width + tile_size - 1) / tile_size
+        self.rows = (height + tile_size - 1) / tile_size
+        self.tiles = [0.0] * (self.columns * self.rows)
+        self.last_update = None
+        self.deferred = False
+        
+        self.counters = {"partial updates": 0, "partial area": 0,
+                         "full refreshes": 0, "threshold refreshes": 0,
+                         "idle refreshes": 0, "policy refreshes": 0,
+                         "deferred refreshes": 0}
+    
+    def record(self, rect, mode, now = None):
+    
+        """Records an update of the (x, y, width, height) rect using the given
+        mode."""
+        
+        if now is None:
+            now = time.time()
+        
+        if mode == FULL:
+            self._clear_tiles(rect)
+            self.counters["full refreshes"] += 1
+            return
+        
+        x, y, w, h = rect
+        self.counters["partial updates"] += 1
+        self.counters["partial area"] += w * h
+        self.last_update = now
+        
+        size = self.tile_size
+        area = float(size * size)
+        last_row = min((y + h - 1) / size + 1, self.rows)
+        last_column = min((x + w - 1) / size + 1, self.columns)
+        
+        for row in range(y / size, last_row):
+        
+            ty = row * size
+            dy = min(y + h, ty + size) - max(y, ty)
+            
+            for column in range(x / size, last_column):
+            
+                tx = column * size
+                dx = min(x + w, tx + size) - max(x, tx)
+                self.tiles[row * self.columns + column] += (dx * dy) / area
+    
+    def _clear_tiles(self, rect):
+    
+        x, y, w, h = rect
+        size = self.tile_size
+        
+        # Only clear the tiles that are completely covered by the update.
+        last_row = min((y + h) / size, self.rows)
+        last_column = min((x + w) / size, self.columns)
+        
+        for row in range((y + size - 1) / size, last_row):
+            for column in range((x + size - 1) / size, last_column):
+                self.tiles[row * self.columns + column] = 0.0
+        
+        if (x, y, w, h) == (0, 0, self.width, self.height):
+            self.tiles = [0.0] * len(self.tiles)
+    
+    def refresh_reason(self, now = None, idle = False):
+    
+        """Returns the reason a full refresh is due, or None if there is no
+        need for one. The idle time is only taken into account if idle is
+        True, when the screen is known to be idle."""
+        
+        if now is None:
+            now = time.time()
+        
+        if self.policy.wants_refresh():
+            reason = "policy refreshes"
+        elif max(self.tiles) >= self.threshold:
+            reason = "threshold refreshes"
+        elif idle and self.idle_time is not None and \
+             self.last_update is not None and \
+             now - self.last_update >= self.idle_time and max(self.tiles) > 0:
+            reason = "idle refreshes"
+        else:
+            return None
+        
+        if not self.policy.allow_refresh():
+            # Only count a deferred refresh once, however many times it is
+            # asked for before it is performed.
+            if not self.deferred:
+                self.counters["deferred refreshes"] += 1
+                self.deferred = True
+            return None
+        
+        return reason
+    
+    def ghosting(self):
+    
+        """Returns True if partial updates have been made to any part of the
+        screen since it was last refreshed."""
+        
+        return max(self.tiles) > 0
+    
+    def refreshed(self, reason):
+    
+        """Records that a full refresh of the screen was performed for the
+        given reason."""
+        
+        self.tiles = [0.0] * len(self.tiles)
+        self.last_update = None
+        self.deferred = False
+        self.counters["full refreshes"] += 1
+        if reason in self.counters:
+            self.counters[reason] += 1
+        self.policy.refreshed()
+
+
+class Controller:
+
+    """Collects damaged regions of the screen in a queue, merging regions that
+    overlap or touch, and submits the resulting updates to the device when
+    flush() is called."""
+    
+    def __init__(self, fb, device = None, scheduler = None):
+    
+        g = fb.geometry()
+        self.width = g.width
+        self.height = g.height
+        
+        if device is None:
+            device = Device(fb)
+        
+        self.device = device
+        self.scheduler = scheduler
+        self.queue = []
+        self.marker = 0
+    
+    def add(self, rect, mode = FAST):
+    
+        """Adds the (x, y, width, height) rect to the queue of regions to be
+        updated with the given mode."""
+        
+        x, y, w, h = rect
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(x + w, self.width)
+        y2 = min(y + h, self.height)
+        
+        if x1 >= x2 or y1 >= y2:
+            return
+        
+        region = [x1, y1, x2, y2, mode]
+        
+        # Merge the new region with any that overlap or touch it, repeating
+        # until the merged region does not meet any others.
+        merged = True
+        while merged:
+        
+            merged = False
+            
+            for other in self.queue:
+            
+                if region[0] <= other[2] and other[0] <= region[2] and \
+                   region[1] <= other[3] and other[1] <= region[3]:
+                
+                    region = [min(region[0], other[0]), min(region[1], other[1]),
+                              max(region[2], other[2]), max(region[3], other[3]),
+                              max(region[4], other[4])]
+                    self.queue.remove(other)
+                    merged = True
+                    break
+        
+        self.queue.append(region)
+    
+    def pending(self):
+    
+        """Returns the queued updates as a list of ((x, y, width, height), mode)
+        tuples."""
+        
+        return map(lambda (x1, y1, x2, y2, mode):
+                   ((x1, y1, x2 - x1, y2 - y1), mode), self.queue)
+    
+    def flush(self, wait = False, now = None):
+    
+        """Submits the queued updates to the device, returning the list of
+        updates that were sent. If a scheduler is in use and a full refresh
+        is due, the queued updates are replaced by a full refresh of the
+        screen. If wait is True, waits for the last update to complete."""
+        
+        updates = self.pending()
+        self.queue = []
+        
+        if self.scheduler and updates:
+            # Record the partial updates before asking for a refresh so that
+            # they are included in the decision. Full updates are only
+            # recorded if they are sent. Queued regions do not overlap, so
+            # the order in which they are recorded does not matter.
+            for rect, mode in updates:
+                if mode != FULL:
+                    self.scheduler.record(rect, mode, now)
+            
+            reason = self.scheduler.refresh_reason(now)
+            if reason:
+                updates = [((0, 0, self.width, self.height), FULL)]
+                self.scheduler.refreshed(reason)
+            else:
+                for rect, mode in updates:
+                    if mode == FULL:
+                        self.scheduler.record(rect, mode, now)
+        
+        self._send(updates, wait)
+        return updates
+    
+    def idle(self, now = None):
+    
+        """Performs a full refresh if the scheduler says that one is due while
+        no updates are queued. This should be called periodically, such as
+        from a timer, when using a scheduler with an idle time."""
+        
+        if not self.scheduler or self.queue:
+            return False
+        
+        reason = self.scheduler.refresh_reason(now, idle = True)
+        if not reason:
+            return False
+        
+        self._send([((0, 0, self.width, self.height), FULL)], False)
+        self.scheduler.refreshed(reason)
+        return True
+    
+    def _send(self, updates, wait):
+    
+        for rect, mode in updates:
+        
+            waveform, update_mode = _modes[mode]
+            self.marker += 1
+            self.device.send(rect, waveform, update_mode, self.marker)
+        
+        if wait and updates:
+            self.device.wait(self.marker)
+        
\ No newline at end of file
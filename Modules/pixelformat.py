@@ -0,0 +1,342 @@
+"""
+pixelformat.py - Conversion of pixel data to framebuffer formats.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Source formats. Multi-byte pixels are stored in little-endian order, as in
+# QImage data on the devices we use.
+ARGB32 = "ARGB32"
+RGB32 = "RGB32"
+RGB16 = "RGB16"
+INDEXED8 = "Indexed8"
+GREY8 = "Grey8"
+
+_bytes_per_pixel = {ARGB32: 4, RGB32: 4, RGB16: 2, INDEXED8: 1, GREY8: 1}
+
+# QImage.Format values, listed here so that this module does not need Qt.
+_qimage_formats = {3: INDEXED8, 4: RGB32, 5: ARGB32, 6: ARGB32, 7: RGB16}
+
+_array_types = {8: "B", 16: "H", 32: "I"}
+
+class PixelFormat:
+
+    """Describes the layout of pixels in the framebuffer. The colour fields
+    are (offset, length, msb_right) triples, as in VirtualScreenInfo."""
+    
+    def __init__(self, bits_per_pixel, grayscale = 0, red = (0, 0, 0),
+                       green = (0, 0, 0), blue = (0, 0, 0)):
+    
+        if bits_per_pixel not in (4, 8, 16, 32):
+            raise ValueError("Unsupported framebuffer depth: %i bits per "
+                             "pixel." % bits_per_pixel)
+        
+        self.bits_per_pixel = bits_per_pixel
+        self.red = tuple(red)
+        self.green = tuple(green)
+        self.blue = tuple(blue)
+        
+        # Depths below 16 bits per pixel are always treated as greyscale.
+        self.grayscale = bool(grayscale) or bits_per_pixel < 16
+    
+    def line_length(self, width):
+    
+        return (width * self.bits_per_pixel + 7) / 8
+
+def screen_format(info):
+
+    """Returns the PixelFormat for a VirtualScreenInfo or FramebufferGeometry
+    object."""
+    
+    return PixelFormat(info.bits_per_pixel, info.grayscale,
+                       info.red, info.green, info.blue)
+
+RGB565 = PixelFormat(16, 0, (11, 5, 0), (5, 6, 0), (0, 5, 0))
+
+def _field_table(field):
+
+    # Map 8-bit channel values to the bits of a field, scaling each value to
+    # the range of the field.
+    offset, length = field[:2]
+    maximum = (1 << length) - 1
+    return [((v * maximum) / 255) << offset for v in range(256)]
+
+def _level_table(bits):
+
+    maximum = (1 << bits) - 1
+    return [(v * maximum) / 255 for v in range(256)]
+
+
+class Converter:
+
+    """Converts rows of pixels in one of the source formats to the given
+    target PixelFormat. Indexed8 data needs a colour table of 0xAARRGGBB
+    values, like the one returned by QImage.colorTable()."""
+    
+    def __init__(self, source, target, colour_table = None):
+    
+        if source not in _bytes_per_pixel:
+            raise ValueError("Unsupported source format: %s" % source)
+        if source == INDEXED8 and colour_table is None:
+            raise ValueError("A colour table is required for Indexed8 data.")
+        
+        self.source = source
+        self.target = target
+        self.colour_table = colour_table
+        
+        if target.grayscale:
+            # Grey levels are scaled to the full range of the pixel, so that
+            # 16 and 32-bit greyscale pixels are not nearly black.
+            self._tables = (_level_table(target.bits_per_pixel),)
+        else:
+            self._tables = (_field_table(target.red), _field_table(target.green),
+                            _field_table(target.blue))
+        
+        self._byte_table = None
+        self._word_table = None
+    
+    def convert(self, data, width, height, stride = None):
+    
+        """Converts a region of width x height pixels from the string, buffer
+        or QImage data with the given stride, returning a string with rows
+        packed using the minimum line length for the target format."""
+        
+        bpp = _bytes_per_pixel[self.source]
+        if stride is None:
+            stride = width * bpp
+        
+        if width <= 0 or height <= 0:
+            return ""
+        
+        if numpy:
+            return self._convert_numpy(data, width, height, stride)
+        
+        rows = []
+        for y in range(height):
+            start = y * stride
+            row = data[start:start + width * bpp]
+            rows.append(self._convert_row(row, width))
+        
+        return "".join(rows)
+    
+    def convert_row(self, row, width):
+    
+        return self.convert(row, width, 1)
+    
+    # NumPy implementation
+    
+    def _channels(self, data, width, height, stride):
+    
+        # The data may end with the last pixel of the region rather than at
+        # the end of a whole row, so only read the bytes that are needed and
+        # step through them by the stride.
+        bpp = _bytes_per_pixel[self.source]
+        pixels = numpy.frombuffer(data, numpy.uint8, (height - 1) * stride + width * bpp)
+        pixels = numpy.lib.stride_tricks.as_strided(pixels, (height, width * bpp),
+                                                    (stride, 1))
+        
+        if self.source in (ARGB32, RGB32):
+            return pixels[:, 2::4], pixels[:, 1::4], pixels[:, 0::4]
+        
+        elif self.source == RGB16:
+            values = pixels.copy().view("<u2")
+            r = (values >> 11) & 0x1f
+            g = (values >> 5) & 0x3f
+            b = values & 0x1f
+            return ((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2))
+        
+        elif self.source == INDEXED8:
+            # Pixels beyond the end of a short colour table are black, as in
+            # the pure Python implementation.
+            table = numpy.zeros(256, numpy.uint32)
+            table[:len(self.colour_table)] = self.colour_table
+            values = table[pixels]
+            return ((values >> 16) & 0xff, (values >> 8) & 0xff, values & 0xff)
+        
+        else:
+            return pixels, pixels, pixels
+    
+    def _convert_numpy(self, data, width, height, stride):
+    
+        r, g, b = self._channels(data, width, height, stride)
+        bits = self.target.bits_per_pixel
+        
+        if self.target.grayscale:
+        
+            if self.source == GREY8:
+                grey = r
+            else:
+                grey = (r.astype(numpy.uint32) * 77 + g.astype(numpy.uint32) * 151 +
+                        b.astype(numpy.uint32) * 28) >> 8
+            
+            dtype = {4: numpy.uint8, 8: numpy.uint8, 16: "<u2", 32: "<u4"}[bits]
+            levels = numpy.array(self._tables[0], dtype)[grey]
+            
+            if bits == 4:
+                # Pack two pixels into each byte, with the first pixel in the
+                # low nibble.
+                if width % 2 != 0:
+                    padding = numpy.zeros((height, 1), numpy.uint8)
+                    levels = numpy.hstack((levels, padding))
+                levels = levels[:, 0::2] | (levels[:, 1::2] << 4)
+            
+            return levels.tostring()
+        
+        dtype = {16: "<u2", 32: "<u4"}[bits]
+        red, green, blue = [numpy.array(table, dtype) for table in self._tables]
+        return (red[r] | green[g] | blue[b]).tostring()
+    
+    # Pure Python implementation using lookup tables
+    
+    def _pixel_value(self, r, g, b):
+    
+        if self.target.grayscale:
+            return self._tables[0][(r * 77 + g * 151 + b * 28) >> 8]
+        else:
+            red, green, blue = self._tables
+            return red[r] | green[g] | blue[b]
+    
+    def _convert_row(self, row, width):
+    
+        if self.source in (GREY8, INDEXED8):
+        
+            if not self._byte_table:
+                if self.source == GREY8:
+                    colours = [(v, v, v) for v in range(256)]
+                else:
+                    colours = [((c >> 16) & 0xff, (c >> 8) & 0xff, c & 0xff)
+                               for c in self.colour_table]
+                    colours += [(0, 0, 0)] * (256 - len(colours))
+                self._byte_table = [self._pixel_value(*c) for c in colours]
+            
+            table = self._byte_table
+            values = map(table.__getitem__, array.array("B", row))
+        
+        elif self.source == RGB16:
+        
+            # Build a table for all 16-bit values on first use.
+            if not self._word_table:
+                table = []
+                for v in xrange(65536):
+                    r = (v >> 11) & 0x1f
+                    g = (v >> 5) & 0x3f
+                    b = v & 0x1f
+                    table.append(self._pixel_value((r << 3) | (r >> 2),
+                        (g << 2) | (g >> 4), (b << 3) | (b >> 2)))
+                self._word_table = table
+            
+            values = map(self._word_table.__getitem__, array.array("H", row))
+        
+        else:
+            pixels = array.array("B", row)
+            values = map(self._pixel_value, pixels[2::4], pixels[1::4], pixels[0::4])
+        
+        bits = self.target.bits_per_pixel
+        if bits == 4:
+            if width % 2 != 0:
+                values.append(0)
+            values = map(lambda low, high: low | (high << 4),
+                         values[0::2], values[1::2])
+            bits = 8
+        
+        return array.array(_array_types[bits], values).tostring()
+
+
+def convert_image(image, target, rect = None):
+
+    """Converts the region of the QImage given by the (x, y, width, height)
+    rect, or the whole image, to the target format. Returns the data and its
+    stride."""
+    
+    try:
+        source = _qimage_formats[image.format()]
+    except KeyError:
+        raise ValueError("Unsupported QImage format: %i" % image.format())
+    
+    if rect is None:
+        x, y, width, height = 0, 0, image.width(), image.height()
+    else:
+        x, y, width, height = rect
+    
+    colour_table = None
+    if source == INDEXED8:
+        colour_table = list(image.colorTable())
+    
+    bits = image.bits()
+    bits.setsize(image.byteCount())
+    data = buffer(bits, (y * image.bytesPerLine()) + (x * _bytes_per_pixel[source]))
+    
+    converter = Converter(source, target, colour_table)
+    return (converter.convert(data, width, height, image.bytesPerLine()),
+            target.line_length(width))
+
+def to_rgb(data, width, height, stride, format):
+
+    """Converts a region of pixel data in the given PixelFormat to a string
+    of 24-bit RGB values, such as those found in PNG files."""
+    
+    bits = format.bits_per_pixel
+    
+    if format.grayscale:
+        if bits == 4:
+            levels = [v * 17 for v in range(16)]
+        else:
+            levels = range(256)
+    
+    rows = []
+    
+    for y in range(height):
+    
+        start = y * stride
+        row = data[start:start + format.line_length(width)]
+        
+        if format.grayscale:
+            if bits == 4:
+                pixels = array.array("B", row)
+                values = []
+                for v in pixels:
+                    values.append(v & 0x0f)
+                    values.append(v >> 4)
+                values = values[:width]
+            else:
+                values = array.array(_array_types[bits], row)
+            grey = array.array("B", map(lambda v: levels[v & 0xff], values))
+            rgb = array.array("B", [0]) * (width * 3)
+            rgb[0::3] = grey
+            rgb[1::3] = grey
+            rgb[2::3] = grey
+        
+        else:
+            values = array.array(_array_types[bits], row)
+            rgb = array.array("B", [0]) * (width * 3)
+            for i, field in enumerate((format.red, format.green, format.blue)):
+                offset, length = field[:2]
+                maximum = (1 << length) - 1
+                if maximum == 0:
+                    continue
+                rgb[i::3] = array.array("B", map(
+                    lambda v: (((v >> offset) & maximum) * 255) / maximum, values))
+        
+        rows.append(rgb.tostring())
+    
+    return "".join(rows)
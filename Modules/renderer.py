@@ -0,0 +1,187 @@
+"""
+renderer.py - A simple software renderer for the Linux framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pixelformat
+
+class Renderer:
+
+    """Draws directly into the drawing page of a linuxfb.Framebuffer. Colours
+    are strings of packed pixel data returned by pack_colour(). All drawing
+    operations are clipped to the screen."""
+    
+    def __init__(self, fb):
+    
+        self._fb = fb
+        self._geometry = g = fb.geometry()
+        self._buffer = fb.get_buffer()
+        
+        if g.bits_per_pixel % 8 != 0:
+            raise ValueError("Cannot render to a framebuffer with %i bits "
+                             "per pixel." % g.bits_per_pixel)
+        
+        self._width = g.width
+        self._height = g.height
+        self._bpp = g.bytes_per_pixel
+        self._format = pixelformat.screen_format(g)
+        self._converter = pixelformat.Converter(pixelformat.ARGB32, self._format)
+    
+    def _offset(self, x, y):
+    
+        return self._geometry.offset(x, y, self._fb.drawing_page())
+    
+    def pack_colour(self, red, green, blue):
+    
+        pixel = chr(blue) + chr(green) + chr(red) + "\xff"
+        return self._converter.convert(pixel, 1, 1)
+    
+    def span(self, x, y, data):
+    
+        """Writes a row of packed pixel data starting at (x, y)."""
+        
+        if y < 0 or y >= self._height:
+            return
+        
+        length = len(data) / self._bpp
+        x1 = max(0, x)
+        x2 = min(x + length, self._width)
+        
+        if x1 >= x2:
+            return
+        
+        if x1 != x or x2 != x + length:
+            data = data[(x1 - x) * self._bpp:(x2 - x) * self._bpp]
+        
+        o = self._offset(x1, y)
+        self._buffer[o:o + len(data)] = data
+    
+    def hline(self, x, y, length, colour):
+    
+        if y < 0 or y >= self._height:
+            return
+        
+        x1 = max(0, x)
+        x2 = min(x + length, self._width)
+        
+        if x1 < x2:
+            o = self._offset(x1, y)
+            self._buffer[o:o + (x2 - x1) * self._bpp] = colour * (x2 - x1)
+    
+    def vline(self, x, y, length, colour):
+    
+        self.fill(x, y, 1, length, colour)
+    
+    def fill(self, x, y, width, height, colour):
+    
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(x + width, self._width)
+        y2 = min(y + height, self._height)
+        
+        if x1 >= x2 or y1 >= y2:
+            return
+        
+        run = colour * (x2 - x1)
+        length = len(run)
+        b = self._buffer
+        
+        for y in xrange(y1, y2):
+            o = self._offset(x1, y)
+            b[o:o + length] = run
+    
+    def rect(self, x, y, width, height, colour):
+    
+        """Draws the outline of a rectangle."""
+        
+        if width <= 0 or height <= 0:
+            return
+        
+        self.hline(x, y, width, colour)
+        self.hline(x, y + height - 1, width, colour)
+        self.fill(x, y + 1, 1, height - 2, colour)
+        self.fill(x + width - 1, y + 1, 1, height - 2, colour)
+    
+    def line(self, x0, y0, x1, y1, colour):
+    
+        """Draws a line using Bresenham's algorithm, writing each horizontal
+        run of pixels in one operation."""
+        
+        if y0 == y1:
+            self.hline(min(x0, x1), y0, abs(x1 - x0) + 1, colour)
+            return
+        
+        dx = abs(x1 - x0)
+        dy = abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        error = dx - dy
+        
+        # The start of the current horizontal run.
+        rx = x0
+        
+        while True:
+        
+            px, py = x0, y0
+            if x0 == x1 and y0 == y1:
+                self.hline(min(rx, px), py, abs(px - rx) + 1, colour)
+                break
+            
+            e2 = 2 * error
+            if e2 > -dy:
+                error -= dy
+                x0 += sx
+            if e2 < dx:
+                error += dx
+                y0 += sy
+            
+            if y0 != py:
+                # Moving to the next row, so write the run for this one.
+                self.hline(min(rx, px), py, abs(px - rx) + 1, colour)
+                rx = x0
+    
+    def text(self, x, y, text, font, colour):
+    
+        """Draws the text using a bitmapfont.BitmapFont with the top of the
+        first character at (x, y). Returns the x coordinate following the
+        last character."""
+        
+        for character in text:
+        
+            glyph = font.glyph(character)
+            for row, start, length in glyph.spans:
+                self.hline(x + start, y + row, length, colour)
+            
+            x += glyph.advance
+        
+        return x
+    
+    def blit(self, image, x, y, stride = None):
+    
+        """Draws an image at (x, y). The image is either a QImage, which is
+        converted to the framebuffer format, or a string of data already in
+        that format with the given stride."""
+        
+        if hasattr(image, "bits"):
+            image, stride = pixelformat.convert_image(image, self._format)
+        
+        width = stride / self._bpp
+        height = len(image) / stride
+        
+        for row in xrange(max(0, -y), min(height, self._height - y)):
+            start = row * stride
+            self.span(x, y + row, image[start:start + width * self._bpp])
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+blit_benchmark.py - Compare full-frame and region blits to a framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys, time
+import linuxfb
+
+def measure(fb, image, rect, stride, repeats):
+
+    t = time.time()
+    for i in xrange(repeats):
+        fb.blit(image, rect, stride)
+    
+    return (time.time() - t) / repeats
+
+def measure_writer(fb, image, rect, stride, repeats):
+
+    """Returns the mean time taken to submit a job to a writer thread and the
+    writer's statistics."""
+    
+    writer = linuxfb.FramebufferWriter(fb)
+    
+    t = time.time()
+    for i in xrange(repeats):
+        writer.submit(image, rect, stride)
+    
+    seconds = (time.time() - t) / repeats
+    writer.stop()
+    return seconds, writer
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 2:
+        sys.stderr.write("Usage: %s [repeats]\n" % sys.argv[0])
+        sys.exit(1)
+    
+    if len(sys.argv) == 2:
+        repeats = int(sys.argv[1])
+    else:
+        repeats = 100
+    
+    fb = linuxfb.SimulatedFramebuffer()
+    g = fb.geometry()
+    image = "\xff\xff" * g.width * g.height
+    
+    regions = [
+        ("full frame", None),
+        ("clock hand (200x200)", (300, 100, 200, 200)),
+        ("keyboard key (64x64)", (100, 500, 64, 64)),
+        ("text line (800x32)", (0, 280, 800, 32))
+        ]
+    
+    for name, rect in regions:
+    
+        if rect:
+            x, y, w, h = rect
+        else:
+            w, h = g.width, g.height
+        
+        seconds = measure(fb, image, rect, g.stride, repeats)
+        print "%-24s %8i bytes %10.3f ms" % (name, w * h * g.bytes_per_pixel,
+                                             seconds * 1000)
+    
+    print
+    print "Writer thread: submit time, copies, mean copy time, mean latency"
+    
+    for name, rect in regions:
+    
+        seconds, writer = measure_writer(fb, image, rect, g.stride, repeats)
+        print "%-24s %10.3f ms %6i %10.3f ms %10.3f ms" % (
+            name, seconds * 1000, writer.stats["copied"],
+            writer.mean_copy_time() * 1000, writer.mean_latency() * 1000)
+    
+    print
+    print "Rotated full frames"
+    
+    # Use an image in the orientation that fills the screen after rotation.
+    rotated = "\xff\xff" * g.width * g.height
+    
+    for name, rotation, stride in (
+        ("90 degrees", linuxfb.FB_ROTATE_CW, g.height * g.bytes_per_pixel),
+        ("180 degrees", linuxfb.FB_ROTATE_UD, g.stride),
+        ("270 degrees", linuxfb.FB_ROTATE_CCW, g.height * g.bytes_per_pixel)):
+    
+        t = time.time()
+        for i in xrange(repeats):
+            fb.blit_rotated(rotated, rotation, None, stride)
+        
+        seconds = (time.time() - t) / repeats
+        print "%-24s %10.3f ms" % (name, seconds * 1000)
+    
+    sys.exit()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+double_buffering.py - Checks page flipping on a simulated framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import linuxfb
+
+def displayed_page(fb):
+
+    """Returns the contents of the page that the simulated display has been
+    panned to."""
+    
+    g = fb.geometry()
+    yoffset = fb.virtual_screen_info().yoffset
+    b = fb.get_buffer()
+    start = yoffset * g.stride
+    return b[start:start + g.stride * g.height]
+
+
+if __name__ == "__main__":
+
+    # A device without room for a second page cannot be double buffered.
+    fb = linuxfb.SimulatedFramebuffer(xres = 16, yres = 8, bits_per_pixel = 8)
+    assert not fb.enable_double_buffering()
+    assert fb.drawing_page() == 0
+    
+    fb = linuxfb.SimulatedFramebuffer(xres = 16, yres = 8, bits_per_pixel = 8,
+                                      yres_virtual = 16)
+    assert fb.enable_double_buffering()
+    g = fb.geometry()
+    assert g.pages == 2
+    
+    # Drawing starts in the page that is not displayed.
+    assert fb.drawing_page() == 1
+    assert fb.virtual_screen_info().yoffset == 0
+    
+    previous = displayed_page(fb)
+    
+    for frame in range(4):
+    
+        page = fb.drawing_page()
+        data = chr(frame + 1) * (g.stride * g.height)
+        fb.blit(data, stride = g.stride)
+        
+        # The drawing must not be visible until the pages are flipped.
+        assert displayed_page(fb) == previous, frame
+        
+        fb.flip()
+        
+        assert fb.virtual_screen_info().yoffset == page * g.height, frame
+        assert displayed_page(fb) == data, frame
+        assert fb.drawing_page() == 1 - page, frame
+        previous = data
+    
+    print "Double buffering OK"
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+framebuffer_writer.py - Checks the framebuffer writer thread on a simulated
+framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import threading
+import linuxfb
+
+class Gate:
+
+    """Holds up the writer thread after it copies its first job, so that
+    later jobs stay in the queue until release() is called."""
+    
+    def __init__(self):
+    
+        self.event = threading.Event()
+        self.calls = 0
+    
+    def __call__(self, rect):
+    
+        self.calls += 1
+        if self.calls == 1:
+            self.event.wait()
+    
+    def release(self):
+    
+        self.event.set()
+
+def rows(fb):
+
+    g = fb.geometry()
+    b = fb.get_buffer()
+    return [b[g.offset(0, y):g.offset(0, y) + g.stride] for y in range(g.height)]
+
+
+if __name__ == "__main__":
+
+    fb = linuxfb.SimulatedFramebuffer(xres = 8, yres = 2, bits_per_pixel = 8)
+    g = fb.geometry()
+    
+    a = "\x01" * (g.stride * g.height)
+    b = "\x02" * (g.stride * g.height)
+    c = "\x03" * (g.stride * g.height)
+    
+    # Submit A, then B over the same area, then an A region next to the
+    # first one. B is newer than the first A region, so it must remain
+    # visible where they overlap.
+    gate = Gate()
+    writer = linuxfb.FramebufferWriter(fb, callback = gate)
+    writer.submit(c, (7, 0, 1, 1), g.stride)
+    writer.submit(a, (0, 0, 4, 2), g.stride)
+    writer.submit(b, (0, 0, 4, 2), g.stride)
+    writer.submit(a, (4, 0, 3, 2), g.stride)
+    gate.release()
+    writer.stop()
+    
+    assert rows(fb) == ["\x02" * 4 + "\x01" * 3 + "\x03",
+                        "\x02" * 4 + "\x01" * 3 + "\x00"], rows(fb)
+    assert writer.stats["merged"] == 0
+    
+    # Regions of the same image that meet are merged when no other image
+    # is involved, and covered regions are dropped.
+    gate = Gate()
+    writer = linuxfb.FramebufferWriter(fb, callback = gate)
+    writer.submit(c, (7, 1, 1, 1), g.stride)
+    writer.submit(b, (0, 0, 2, 2), g.stride)
+    writer.submit(b, (2, 0, 2, 2), g.stride)
+    writer.submit(b, (0, 0, 6, 2), g.stride)
+    gate.release()
+    writer.stop()
+    
+    assert rows(fb) == ["\x02" * 6 + "\x01\x03", "\x02" * 6 + "\x01\x03"], rows(fb)
+    assert writer.stats["merged"] == 1
+    assert writer.stats["dropped"] == 1
+    assert writer.stats["copied"] == 2
+    
+    # Submitting to a stopped writer is an error.
+    try:
+        writer.submit(a, None, g.stride)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("A job was submitted to a stopped writer.")
+    
+    print "Framebuffer writer OK"
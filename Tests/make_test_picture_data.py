@@ -19,19 +19,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import struct, sys
-
-red_shift, red_bits = 11, 5
-green_shift, green_bits = 5, 6
-blue_shift, blue_bits = 0, 5
-
-red_max = (1 << red_bits) - 1
-green_max = (1 << green_bits) - 1
-blue_max = (1 << blue_bits) - 1
-
-red_scale = red_max/255.0
-green_scale = green_max/255.0
-blue_scale = blue_max/255.0
+import sys
+import pixelformat
 
 if __name__ == "__main__":
 
@@ -42,14 +31,10 @@ if __name__ == "__main__":
     
     f = open(sys.argv[1], "wb")
     
-    for i in range(256):
-    
-        r = int(i * red_scale) << red_shift
-        g = int(i * green_scale) << green_shift
-        b = int(i * blue_scale) << blue_shift
-        v = struct.pack("<H", r | g | b)
-        # Write two lines of data.
-        f.write(v * 800 * 2)
+    # Write two lines of data for each grey level.
+    ramp = "".join(map(lambda i: chr(i) * 800 * 2, range(256)))
+    converter = pixelformat.Converter(pixelformat.GREY8, pixelformat.RGB565)
+    f.write(converter.convert(ramp, 800, 512))
     
     f.write(88 * 800 * "\xff\xff")
     
@@ -21,13 +21,14 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import linuxfb, mxink, renderer
 
-def draw_mandelbrot(x1, y1, x2, y2, r1, i1, r2, i2, render, colours):
+def draw_mandelbrot(x1, y1, x2, y2, r1, i1, r2, i2, render, ink, colours):
 
     y = y1
     while y < y2:
     
         i = i1 + y * (i2 - i1)/(y2 - y1)
         x = x1
+        row = []
         
         while x < x2:
         
@@ -40,14 +41,24 @@ def draw_mandelbrot(x1, y1, x2, y2, r1, i1, r2, i2, render, colours):
                 c = c * c + ci
                 count += 1
 
-            colour = colours[count]
-            render.fill(x, y, 1, 1, colour)
+            row.append(colours[count])
             
             x += 1
         
+        # Write the whole row to the framebuffer in one operation.
+        render.span(x1, y, "".join(row))
+        ink.add((x1, y, x2 - x1, 1), mxink.GREYSCALE)
+        
         y += 1
+        
+        # Show the rows drawn so far as a single update.
+        if y % 8 == 0:
+            ink.flush()
+    
+    ink.flush()
 
 fb = linuxfb.Framebuffer("/dev/fb0")
 r = renderer.Renderer(fb)
+ink = mxink.Controller(fb)
 colours = map(lambda t: r.pack_colour(*t), map(lambda x: (x, x, x), range(0, 275, 25)))
-draw_mandelbrot(0, 0, 800, 600, -2.1, -1.4, 1.1, 1.4, r, colours)
+draw_mandelbrot(0, 0, 800, 600, -2.1, -1.4, 1.1, 1.4, r, ink, colours)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""
+page_flip.py - A double-buffering demo for the Kobo Mini.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys, time
+import linuxfb
+
+if __name__ == "__main__":
+
+    if len(sys.argv) == 2:
+        fbdev = sys.argv[1]
+    else:
+        fbdev = "/dev/fb0"
+    
+    fb = linuxfb.Framebuffer(fbdev)
+    
+    if not fb.enable_double_buffering():
+        sys.stderr.write("Double buffering is not supported by %s\n" % fbdev)
+        sys.exit(1)
+    
+    g = fb.geometry()
+    
+    # Prepare frames with horizontal bands that move down the screen.
+    white = "\xff" * g.stride
+    black = "\x00" * g.stride
+    
+    for frame in range(8):
+    
+        rows = []
+        for y in range(g.height):
+            if (y / 32) % 8 == frame:
+                rows.append(black)
+            else:
+                rows.append(white)
+        
+        fb.blit("".join(rows), stride = g.stride)
+        fb.flip()
+        time.sleep(1)
+    
+    sys.exit()
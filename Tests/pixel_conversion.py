@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""
+pixel_conversion.py - Checks the conversion of image regions to framebuffer formats.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import array
+import pixelformat
+
+formats = [
+    ("4-bit grey", pixelformat.PixelFormat(4, 1)),
+    ("8-bit grey", pixelformat.PixelFormat(8, 1)),
+    ("16-bit grey", pixelformat.PixelFormat(16, 1)),
+    ("RGB565", pixelformat.RGB565)
+    ]
+
+def source_image(width, height):
+
+    """Returns RGB32 data for an image with a different colour in each pixel,
+    with rows padded to a whole number of 16 bytes, and the stride."""
+    
+    stride = ((width * 4) + 15) & ~15
+    data = array.array("B", [0] * (stride * height))
+    
+    for y in range(height):
+        for x in range(width):
+            i = (y * stride) + (x * 4)
+            data[i:i + 4] = array.array("B", [x * 12, y * 25, (x + y) * 8, 255])
+    
+    return data.tostring(), stride
+
+def convert_rect(data, stride, rect, format):
+
+    """Converts the rect of the RGB32 data in the same way as convert_image(),
+    passing a buffer that starts at the first pixel of the rect."""
+    
+    x, y, w, h = rect
+    converter = pixelformat.Converter(pixelformat.RGB32, format)
+    return converter.convert(buffer(data, (y * stride) + (x * 4)), w, h, stride)
+
+def convert_rows(data, stride, rect, format):
+
+    """Converts the rect one row at a time, for comparison."""
+    
+    x, y, w, h = rect
+    converter = pixelformat.Converter(pixelformat.RGB32, format)
+    rows = []
+    for row in range(y, y + h):
+        start = (row * stride) + (x * 4)
+        rows.append(converter.convert(data[start:start + (w * 4)], w, 1))
+    
+    return "".join(rows)
+
+
+if __name__ == "__main__":
+
+    width, height = 20, 10
+    data, stride = source_image(width, height)
+    
+    # Rects that start part way along a row and reach the last row of the
+    # image, where the data ends before a whole stride.
+    rects = [(5, 5, 5, 5), (19, 9, 1, 1), (1, 0, 19, 10), (0, 0, 20, 10)]
+    
+    numpy = pixelformat.numpy
+    implementations = [("Python", None)]
+    if numpy:
+        implementations.insert(0, ("NumPy", numpy))
+    
+    for name, module in implementations:
+    
+        pixelformat.numpy = module
+        
+        for format_name, format in formats:
+            for rect in rects:
+            
+                expected = convert_rows(data, stride, rect, format)
+                result = convert_rect(data, stride, rect, format)
+                assert result == expected, (name, format_name, rect)
+        
+        # Grey levels fill the range of 16-bit greyscale pixels.
+        converter = pixelformat.Converter(pixelformat.GREY8, pixelformat.PixelFormat(16, 1))
+        values = array.array("H", converter.convert("\x00\x80\xff", 3, 1))
+        assert list(values) == [0, 0x8080, 0xffff], (name, values)
+        
+        # Indexes beyond the end of a short colour table give black pixels.
+        table = [0xffff0000, 0xff00ff00, 0xff0000ff]
+        converter = pixelformat.Converter(pixelformat.INDEXED8, pixelformat.RGB565, table)
+        values = array.array("H", converter.convert("\x00\x01\x02\x03\xff", 5, 1))
+        assert list(values) == [0xf800, 0x07e0, 0x001f, 0, 0], (name, values)
+        
+        print name, "conversion OK"
+    
+    pixelformat.numpy = numpy
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+simulated_framebuffer.py - Checks the file-backed framebuffer simulator.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, struct, tempfile, zlib
+import linuxfb
+
+def read_png(path):
+
+    """Returns the width, height and RGB data of a PNG file written by
+    Framebuffer.save_png()."""
+    
+    data = open(path, "rb").read()
+    assert data[:8] == "\x89PNG\r\n\x1a\n"
+    
+    offset = 8
+    chunks = {}
+    while offset < len(data):
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        chunks[kind] = data[offset + 8:offset + 8 + length]
+        offset += length + 12
+    
+    width, height, depth, colour = struct.unpack(">IIBB", chunks["IHDR"][:10])
+    assert (depth, colour) == (8, 2)
+    
+    # Remove the filter type from the start of each row.
+    pixels = zlib.decompress(chunks["IDAT"])
+    row_length = (width * 3) + 1
+    rows = []
+    for start in range(0, row_length * height, row_length):
+        assert pixels[start] == "\x00"
+        rows.append(pixels[start + 1:start + row_length])
+    
+    return width, height, "".join(rows)
+
+
+if __name__ == "__main__":
+
+    # Use a line length with padding at the end of each row, as some
+    # drivers do.
+    fb = linuxfb.SimulatedFramebuffer(xres = 20, yres = 10, bits_per_pixel = 16,
+                                      line_length = 48)
+    
+    v = fb.virtual_screen_info()
+    assert (v.xres, v.yres, v.bits_per_pixel, v.grayscale) == (20, 10, 16, 0)
+    assert (v.red, v.green, v.blue) == ((11, 5, 0), (5, 6, 0), (0, 5, 0))
+    
+    f = fb.fixed_screen_info()
+    assert f.id.rstrip("\x00") == "simulated"
+    assert (f.line_length, f.smem_len) == (48, 480)
+    
+    g = fb.geometry()
+    assert (g.width, g.height, g.stride, g.pages) == (20, 10, 48, 1)
+    
+    # Copy pixels to the corners of the screen and read them back.
+    red, green, blue, white = "\x00\xf8", "\xe0\x07", "\x1f\x00", "\xff\xff"
+    corners = [((0, 0), red), ((19, 0), green), ((0, 9), blue), ((19, 9), white)]
+    
+    for (x, y), pixel in corners:
+        fb.blit(pixel, (0, 0, 1, 1), 2, (x, y))
+        assert fb.grab((x, y, 1, 1)) == (pixel, 2), (x, y)
+    
+    # The padding at the end of each row must not be written.
+    b = fb.get_buffer()
+    for y in range(g.height):
+        assert b[g.offset(20, y):g.offset(0, y) + g.stride] == "\x00" * 8, y
+    
+    # Check the PNG written for the screen.
+    handle, path = tempfile.mkstemp(".png")
+    os.close(handle)
+    try:
+        fb.save_png(path)
+        width, height, rgb = read_png(path)
+    finally:
+        os.remove(path)
+    
+    assert (width, height) == (20, 10)
+    
+    expected = {(0, 0): "\xff\x00\x00", (19, 0): "\x00\xff\x00",
+                (0, 9): "\x00\x00\xff", (19, 9): "\xff\xff\xff"}
+    
+    for y in range(height):
+        for x in range(width):
+            i = ((y * width) + x) * 3
+            assert rgb[i:i + 3] == expected.get((x, y), "\x00\x00\x00"), (x, y)
+    
+    # Blanking is recorded by the simulated device.
+    fb.blank()
+    assert fb._device.blank_level == linuxfb.VESA_POWERDOWN
+    fb.unblank()
+    assert fb._device.blank_level == linuxfb.VESA_NO_BLANKING
+    
+    # At 4 bits per pixel, two pixels share each byte, so regions are copied
+    # as whole bytes.
+    grey = linuxfb.SimulatedFramebuffer(xres = 16, yres = 4, bits_per_pixel = 4)
+    image = "".join(map(chr, range(1, 33)))
+    
+    grey.blit(image, (4, 1, 4, 2), 8)
+    b = grey.get_buffer()
+    expected = ["\x00" * 8, "\x00\x00\x0b\x0c" + "\x00" * 4,
+                "\x00\x00\x13\x14" + "\x00" * 4, "\x00" * 8]
+    assert [b[y * 8:(y + 1) * 8] for y in range(4)] == expected
+    
+    # A region starting and ending part way through a byte is widened.
+    grey.blit(image, (1, 3, 2, 1), 8)
+    assert b[24:32] == "\x19\x1a" + "\x00" * 6
+    
+    assert grey.grab((4, 1, 4, 2)) == ("\x0b\x0c\x13\x14", 2)
+    
+    try:
+        grey.blit(image, (0, 0, 4, 1), 8, (1, 0))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("A region was moved by part of a byte.")
+    
+    # Mode changes update the line length and are checked against the
+    # simulated memory.
+    with fb.mode_change() as change:
+        change.greyscale(8)
+    
+    g = fb.geometry()
+    assert (g.bits_per_pixel, g.grayscale, g.stride) == (8, 1, 20)
+    assert fb.fixed_screen_info().line_length == 20
+    
+    try:
+        with fb.mode_change() as change:
+            change.set(bits_per_pixel = 32)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("A mode larger than the memory was accepted.")
+    
+    print "Simulated framebuffer OK"
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""
+status_overlay.py - A compositor demo with a status strip over an application.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys, time
+import compositor, linuxfb, mxink, pixelformat
+
+if __name__ == "__main__":
+
+    if len(sys.argv) == 2:
+        fb = linuxfb.Framebuffer(sys.argv[1])
+        controller = mxink.Controller(fb)
+    else:
+        fb = linuxfb.SimulatedFramebuffer()
+        controller = mxink.Controller(fb, mxink.RecordingDevice())
+    
+    g = fb.geometry()
+    format = pixelformat.screen_format(g)
+    colour = lambda v: pixelformat.Converter(pixelformat.GREY8, format).convert(chr(v), 1, 1)
+    
+    c = compositor.Compositor(fb, controller)
+    
+    app = compositor.Surface(0, 0, g.width, g.height, format)
+    app.fill(colour(255))
+    for y in range(40, g.height - 40, 40):
+        app.fill(colour(128), (20, y, g.width - 40, 2))
+    
+    status = compositor.Surface(0, 0, g.width, 32, format, z = 1)
+    status.fill(colour(0))
+    
+    c.add(app)
+    c.add(status)
+    print "Initial composition:", c.compose()
+    
+    # Simulate a battery indicator that changes every second. Only the
+    # indicator is copied to the screen.
+    for level in range(10, -1, -1):
+    
+        status.fill(colour(255), (g.width - 120, 8, 100, 16))
+        status.fill(colour(0), (g.width - 120 + level * 10, 8, (10 - level) * 10, 16))
+        print "Battery %3i%%:" % (level * 10), c.compose()
+        time.sleep(1)
+    
+    sys.exit()
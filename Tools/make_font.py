@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+make_font.py - Creates a bitmap font from the configured font and size.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import bitmapfont, buxpaper
+
+from PyQt4.QtGui import QApplication
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 3:
+        sys.stderr.write("Usage: %s [family [point size]]\n" % sys.argv[0])
+        sys.exit(1)
+    
+    family = buxpaper.config.get("font", "DejaVu Serif")
+    size = int(buxpaper.config.get("font size", 24))
+    
+    if len(sys.argv) > 1:
+        family = sys.argv[1]
+    if len(sys.argv) > 2:
+        size = int(sys.argv[2])
+    
+    app = QApplication(sys.argv)
+    
+    font = bitmapfont.rasterise(family, size)
+    font.save(bitmapfont.font_path(family, size))
+    font.save(bitmapfont.default_path)
+    
+    print "Created %s with %i glyphs." % (bitmapfont.font_path(family, size),
+                                          len(font.records))
+    sys.exit()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+set_mode.py - Changes the depth and rotation of the framebuffer.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import linuxfb
+
+usage = """Usage: %s [grey|rgb565] [0|90|180|270] [device]
+
+Switches the framebuffer to 8-bit greyscale or 16-bit RGB565 and rotates it
+by the given number of degrees clockwise, changing the mode in one operation.
+"""
+
+rotations = {"0": linuxfb.FB_ROTATE_UR, "90": linuxfb.FB_ROTATE_CW,
+             "180": linuxfb.FB_ROTATE_UD, "270": linuxfb.FB_ROTATE_CCW}
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    fbdev = "/dev/fb0"
+    depth = None
+    rotation = None
+    
+    for arg in args:
+    
+        if arg in ("grey", "rgb565"):
+            depth = arg
+        elif arg in rotations:
+            rotation = rotations[arg]
+        elif arg.startswith("/"):
+            fbdev = arg
+        else:
+            sys.stderr.write(usage % sys.argv[0])
+            sys.exit(1)
+    
+    fb = linuxfb.Framebuffer(fbdev)
+    
+    try:
+        with fb.mode_change() as mode:
+        
+            if depth == "grey":
+                mode.greyscale(8)
+            elif depth == "rgb565":
+                mode.rgb565()
+            
+            if rotation is not None:
+                mode.rotate(rotation)
+    
+    except (ValueError, IOError), exception:
+        sys.stderr.write("Failed to change the mode: %s\n" % exception)
+        sys.exit(1)
+    
+    v = fb.virtual_screen_info()
+    print "%ix%i, %i bits per pixel, rotation %i" % (
+        v.xres, v.yres, v.bits_per_pixel, v.rotate)
+    
+    sys.exit()
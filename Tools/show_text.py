@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+show_text.py - Writes text directly to the framebuffer using a bitmap font.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+import bitmapfont, buxpaper, linuxfb, mxink, renderer
+
+usage = """Usage: %s [--clear] <text> [x y] [font file] [device]
+
+Draws the text at (x, y), or centred on the screen, using a font created by
+make_font.py, without loading Qt.
+"""
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    clear = "--clear" in args
+    if clear:
+        args.remove("--clear")
+    
+    if not args or len(args) > 5:
+        sys.stderr.write(usage % sys.argv[0])
+        sys.exit(1)
+    
+    text = args.pop(0).decode("utf8")
+    position = None
+    font_path = bitmapfont.default_path
+    fbdev = buxpaper.fbdev
+    
+    if len(args) >= 2 and args[0].isdigit() and args[1].isdigit():
+        position = int(args.pop(0)), int(args.pop(0))
+    if args:
+        font_path = args.pop(0)
+    if args:
+        fbdev = args.pop(0)
+    
+    font = bitmapfont.load(font_path)
+    fb = linuxfb.Framebuffer(fbdev)
+    g = fb.geometry()
+    r = renderer.Renderer(fb)
+    
+    width = font.width(text)
+    if position:
+        x, y = position
+    else:
+        x = (g.width - width) / 2
+        y = (g.height - font.height) / 2
+    
+    if clear:
+        r.fill(0, 0, g.width, g.height, r.pack_colour(255, 255, 255))
+        rect = (0, 0, g.width, g.height)
+    else:
+        r.fill(x, y, width, font.height, r.pack_colour(255, 255, 255))
+        rect = (x, y, width, font.height)
+    
+    r.text(x, y, text, font, r.pack_colour(0, 0, 0))
+    
+    controller = mxink.Controller(fb)
+    controller.add(rect, mxink.GREYSCALE)
+    controller.flush()
+    
+    sys.exit()
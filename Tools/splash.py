@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+"""
+splash.py - Shows a pre-converted start or sleep frame on the screen.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Only modules that do not depend on Qt are used so that this can be run
+# from a boot script before anything else is loaded. Importing buxpaper only
+# reads the settings.
+import os, sys
+import buxpaper, linuxfb, mxink
+
+usage = """Usage: %s [start|sleep|<frame file>] [device]
+
+Copies the frame saved for the start or sleep screen, or the given frame file,
+to the screen and waits for the display to be updated. Exits with a non-zero
+status if the frame cannot be shown, such as when the display mode has
+changed since it was saved.
+"""
+
+frames = {"start": "Start.raw", "sleep": "Sleep.raw"}
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 3:
+        sys.stderr.write(usage % sys.argv[0])
+        sys.exit(1)
+    
+    name = "start"
+    if len(sys.argv) > 1:
+        name = sys.argv[1]
+    
+    if name in frames:
+        path = os.path.join(buxpaper.framedir, frames[name])
+    else:
+        path = name
+    
+    if len(sys.argv) > 2:
+        fbdev = sys.argv[2]
+    else:
+        fbdev = buxpaper.fbdev
+    
+    fb = linuxfb.Framebuffer(fbdev)
+    
+    try:
+        fb.show_frame(path)
+    except (IOError, ValueError), exception:
+        sys.stderr.write("Cannot show the frame: %s\n" % exception)
+        sys.exit(1)
+    
+    # Ask the display controller to show the whole frame, waiting for it to
+    # finish in case the device is about to be suspended.
+    g = fb.geometry()
+    try:
+        controller = mxink.Controller(fb)
+        controller.add((0, 0, g.width, g.height), mxink.FULL)
+        controller.flush(wait = True)
+    except IOError:
+        pass
+    
+    sys.exit()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+"""
+startup_time.py - Measures the time taken to start each application.
+
+Copyright (C) 2014 David Boddie <david@boddie.org.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os, subprocess, sys, time
+
+usage = """Usage: %s [-n <runs>] [applications directory]
+
+Starts a new interpreter for each application entry point and reports the
+time taken to run the interpreter and to import the entry point's module,
+without running its main code. The shortest time from the given number of
+runs is shown. The times for importing the buxpaper and buxui modules on
+their own are shown for comparison.
+"""
+
+# Run in a new interpreter with the path of the module to import, printing
+# the time taken to import it.
+import_code = """
+import imp, os, sys, time
+path = sys.argv[1]
+start = time.time()
+if path.endswith(".py"):
+    sys.path.insert(0, os.path.split(path)[0])
+    imp.load_source("__startup__", path)
+else:
+    __import__(path)
+sys.stdout.write("%f\\n" % (time.time() - start))
+"""
+
+def entry_points(appdir):
+
+    """Returns the paths of the scripts in the applications directory and its
+    subdirectories that can be run as programs."""
+    
+    paths = []
+    
+    for dirpath, dirnames, filenames in os.walk(appdir):
+    
+        # Only look in the applications directory and each application's
+        # own directory.
+        if dirpath != appdir:
+            dirnames[:] = []
+        
+        for name in sorted(filenames):
+        
+            if not name.endswith(".py"):
+                continue
+            
+            path = os.path.join(dirpath, name)
+            if 'if __name__ == "__main__":' in open(path).read():
+                paths.append(path)
+    
+    paths.sort()
+    return paths
+
+def measure(target, runs):
+
+    """Returns the shortest process and import times for the target module or
+    script, or an error message if it could not be imported."""
+    
+    process_times = []
+    import_times = []
+    
+    for i in range(runs):
+    
+        start = time.time()
+        p = subprocess.Popen([sys.executable, "-c", import_code, target],
+                             stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        output, errors = p.communicate()
+        process_times.append(time.time() - start)
+        
+        if p.returncode != 0:
+            lines = errors.strip().split("\n")
+            return None, None, lines[-1]
+        
+        import_times.append(float(output))
+    
+    return min(process_times), min(import_times), None
+
+
+if __name__ == "__main__":
+
+    args = sys.argv[1:]
+    runs = 5
+    
+    if "-n" in args:
+        i = args.index("-n")
+        try:
+            runs = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.stderr.write(usage % sys.argv[0])
+            sys.exit(1)
+        del args[i:i + 2]
+    
+    if len(args) > 1:
+        sys.stderr.write(usage % sys.argv[0])
+        sys.exit(1)
+    elif args:
+        appdir = os.path.abspath(args[0])
+    else:
+        import buxpaper
+        appdir = buxpaper.appdir
+    
+    targets = ["buxpaper", "buxui"] + entry_points(appdir)
+    
+    print "%-40s %10s %10s" % ("Entry point", "Process", "Import")
+    
+    for target in targets:
+    
+        process_time, import_time, error = measure(target, runs)
+        name = target
+        if target.startswith(appdir):
+            name = target[len(appdir):].lstrip(os.sep)
+        
+        if error:
+            print "%-40s %s" % (name, error)
+        else:
+            print "%-40s %9.3fs %9.3fs" % (name, process_time, import_time)